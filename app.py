@@ -5,6 +5,8 @@ import gradio as gr
 from src.dataset.video_to_audio_lips import process_raw_data_for_avsr
 from src.model.avhubert2text import AV2TextForConditionalGeneration
 from src.dataset.load_data import load_feature
+from src.dataset.scratch import get_scratch
+from src.profiling import clip, stage, profile_module, profiling_from_env
 from transformers import Speech2TextTokenizer
 import torch
 import time
@@ -19,6 +21,7 @@ if torch.cuda.is_available():
     model = model.cuda().eval()
 else:
     model = model.eval()
+profile_module(model.get_encoder(), "encoder")
 
 def load_noise_samples(noise_path=Path("./example/")):
     noise_dict = defaultdict(list)
@@ -28,25 +31,27 @@ def load_noise_samples(noise_path=Path("./example/")):
     return noise_dict
 
 def infer_avsr(audio_path, lip_movement_path):
-    sample = load_feature(
-        lip_movement_path,
-        audio_path
-    )
+    with stage("feature_load"):
+        sample = load_feature(
+            lip_movement_path,
+            audio_path
+        )
 
     audio_feats = sample['audio_source']
     video_feats = sample['video_source']
-    attention_mask = torch.BoolTensor(audio_feats.size(0), audio_feats.size(-1)).fill_(False)
+    attention_mask = ~sample['padding_mask']
 
     if torch.cuda.is_available():
         audio_feats = audio_feats.cuda()
         video_feats = video_feats.cuda()
         attention_mask = attention_mask.cuda()
 
-    output = model.generate(
-        audio_feats,
-        attention_mask=attention_mask,
-        video=video_feats,
-    )
+    with stage("generate"):
+        output = model.generate(
+            audio_feats,
+            attention_mask=attention_mask,
+            video=video_feats,
+        )
 
     text_output = tokenizer.batch_decode(output, skip_special_tokens=True)[0]
 
@@ -59,14 +64,15 @@ def handling_video(video, noise_snr, noise_type):
     # print(f"Noise Wav used is {noise_wav_file}")
 
 
-    start_time = time.time()
-    output = process_raw_data_for_avsr(video, noise_wav_file, noise_snr)
-    process_raw_data_for_avsr_process_time = time.time() - start_time
-    print(f"Time taken to process video: {process_raw_data_for_avsr_process_time:.2f}s")
-    print("output process_raw_data_for_avsr", output)
-    start_time = time.time()
-    text_output = infer_avsr(output['audio'], output['lip_movement'])
-    text_output_process_time = time.time() - start_time
+    with clip(video):
+        start_time = time.time()
+        output = process_raw_data_for_avsr(video, noise_wav_file, noise_snr)
+        process_raw_data_for_avsr_process_time = time.time() - start_time
+        print(f"Time taken to process video: {process_raw_data_for_avsr_process_time:.2f}s")
+        print("output process_raw_data_for_avsr", output)
+        start_time = time.time()
+        text_output = infer_avsr(output['audio'], output['lip_movement'])
+        text_output_process_time = time.time() - start_time
     print(f"Time taken to infer AVSR: {text_output_process_time:.2f}s")
     return output['lip_video_path'], f"Process video time: {process_raw_data_for_avsr_process_time:.2f}s\nInfer audio visual time: {text_output_process_time:.2f}s", text_output
 
@@ -96,4 +102,8 @@ if __name__ == "__main__":
         ],
     )
 
-    demo.launch()
\ No newline at end of file
+    # AVSR_PROFILE=<dir> writes per-clip stage timings and a Chrome trace on exit
+    with profiling_from_env(cuda_sync=True):
+        # the lip movement preview lives in the scratch space (e.g. /dev/shm), outside
+        # the cwd and temp dir gradio serves files from by default
+        demo.launch(allowed_paths=[str(get_scratch().root)])
\ No newline at end of file
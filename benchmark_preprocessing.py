@@ -0,0 +1,234 @@
+import os
+import json
+import time
+import argparse
+import platform
+import tempfile
+import cv2
+import numpy as np
+from pathlib import Path
+from scipy.io import wavfile
+from src.dataset.video_to_audio_lips import (
+    get_mean_face_landmarks, stream_normalized_frames, crop_patch, save_video,
+    save_lip_movement, extract_lip_movement,
+)
+from src.dataset.landmark_pool import LandmarkPool
+from src.dataset.face_detectors import benchmark_face_detectors, MODEL_DIR_ENV, get_model_dir
+from src.dataset.load_data import load_feature
+
+# Deterministic synthetic-clip benchmark of the preprocessing path; needs the dlib
+# models (see `load_needed_models_for_lip_movement`, --model-dir or $AVSR_MODEL_DIR) but no dataset.
+RESULTS_DIR = "benchmark_results"
+FRAME_SIZE = (640, 480)
+FPS = 25
+SAMPLE_RATE = 16_000
+SEED = 0
+
+# 68-point topology, used to draw a face-like image around the mean face landmarks
+OPEN_CURVES = [range(0, 17), range(17, 22), range(22, 27), range(27, 31), range(31, 36)]
+CLOSED_CURVES = [range(36, 42), range(42, 48)]
+LOWER_LIP_IDS = [55, 56, 57, 58, 59, 64, 65, 66, 67]
+
+
+def synthetic_landmarks(num_frames, seed=SEED):
+    """Mean face landmarks drifting across the frame with a talking mouth, (T, 68, 2) float32."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(num_frames, dtype=np.float32)
+    mean_face = get_mean_face_landmarks()
+    base = (mean_face - mean_face.mean(axis=0)) * 1.1
+    width, height = FRAME_SIZE
+    offset = np.stack([
+        width / 2 + 60 * np.sin(2 * np.pi * t / 97),
+        height / 2 + 25 * np.sin(2 * np.pi * t / 61),
+    ], axis=1)
+    landmarks = np.repeat(base[None], num_frames, axis=0) + offset[:, None]
+    mouth_open = 8 * (1 + np.sin(2 * np.pi * t / 7)) + rng.uniform(0, 2, num_frames)
+    landmarks[:, LOWER_LIP_IDS, 1] += mouth_open[:, None]
+    return landmarks.astype(np.float32)
+
+
+def render_face(landmarks, seed):
+    """Draw a face-like bgr image around one frame of landmarks."""
+    rng = np.random.default_rng(seed)
+    width, height = FRAME_SIZE
+    image = rng.integers(90, 110, (height, width, 3), dtype=np.uint8)
+    points = np.round(landmarks).astype(np.int32)
+    face = cv2.convexHull(np.concatenate([points, points[17:27] - [0, 40]]))
+    cv2.fillConvexPoly(image, face, (140, 170, 210), lineType=cv2.LINE_AA)
+    for curve in OPEN_CURVES:
+        cv2.polylines(image, [points[list(curve)]], False, (60, 80, 110), 2, cv2.LINE_AA)
+    for curve in CLOSED_CURVES:
+        cv2.fillPoly(image, [points[list(curve)]], (40, 40, 40), cv2.LINE_AA)
+    cv2.fillPoly(image, [points[48:60]], (70, 70, 170), cv2.LINE_AA)
+    cv2.fillPoly(image, [points[60:68]], (30, 20, 40), cv2.LINE_AA)
+    return image
+
+
+def make_clip(out_dir, num_frames, seed=SEED):
+    """Write a synthetic face clip (mp4) and a tone (wav) of matching length."""
+    out_dir = Path(out_dir)
+    video_path = out_dir / f"synthetic_{num_frames}.mp4"
+    audio_path = out_dir / f"synthetic_{num_frames}.wav"
+    landmarks = synthetic_landmarks(num_frames, seed)
+    if not video_path.exists():
+        frames = (render_face(lnd, seed + idx) for idx, lnd in enumerate(landmarks))
+        save_video(frames, video_path, fps=FPS)
+    if not audio_path.exists():
+        t = np.arange(num_frames * SAMPLE_RATE // FPS) / SAMPLE_RATE
+        tone = 0.3 * np.sin(2 * np.pi * 220 * t) * (1 + np.sin(2 * np.pi * 3 * t)) / 2
+        wavfile.write(audio_path, SAMPLE_RATE, (tone * 32767).astype(np.int16))
+    return video_path, audio_path, landmarks
+
+
+def landmark_error(landmarks, valid, reference, reference_valid=None):
+    """Mean distance (px) between the points of `landmarks` and `reference` over frames valid in both."""
+    both = valid if reference_valid is None else valid & reference_valid
+    if not both.any():
+        return None
+    return float(np.linalg.norm(landmarks[both] - reference[both], axis=-1).mean())
+
+
+def timed(fn, repeats):
+    """Best-of-`repeats` wall time of `fn()` and its last result."""
+    best, result = float("inf"), None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def stage_result(seconds, num_frames, **extra):
+    return dict(seconds=seconds, fps=num_frames / seconds if seconds > 0 else None, **extra)
+
+
+def bench_clip(video_path, audio_path, landmarks, pools, modes, detectors, repeats, work_dir):
+    num_frames = len(landmarks)
+    results = {}
+
+    seconds, frames = timed(lambda: list(stream_normalized_frames(video_path)), repeats)
+    results["decode"] = stage_result(seconds, len(frames))
+
+    grays = [cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) for frame in frames]
+    for name, row in benchmark_face_detectors(grays, names=detectors).items():
+        results[f"face_detector/{name}"] = stage_result(
+            len(grays) / row["fps"] if row["fps"] else 0.0, len(grays), detected_ratio=row["detected_ratio"]
+        )
+
+    truth = landmarks[:len(frames)]
+    for workers, pool in pools.items():
+        for detector in detectors:
+            outputs = {}
+            # detect mode first, it is the reference the faster modes are checked against
+            for mode in sorted(modes, key=lambda mode: mode != "detect"):
+                seconds, (found, valid, skipped, stats) = timed(
+                    lambda: pool.detect(
+                        frames, mode=mode, chunk_size=25 if mode != "detect" else None, detector=detector
+                    ),
+                    repeats,
+                )
+                detected = valid & ~skipped  # skipped frames are interpolated later, not errors
+                if not detected.any():
+                    raise RuntimeError(f"No face found in the synthetic clip ({mode} mode, {detector} detector)")
+                outputs[mode] = found, detected
+                reference = outputs.get("detect") if mode != "detect" else None
+                # dlib rows keep their pre-backend names so older results still compare
+                suffix = "" if detector == "dlib" else f"/{detector}"
+                results[f"landmarks/{mode}/w{workers}{suffix}"] = stage_result(
+                    seconds, len(frames),
+                    detected_ratio=float(valid.mean()),
+                    landmark_error=landmark_error(found, detected, truth),
+                    landmark_error_vs_detect=landmark_error(found, detected, *reference) if reference else None,
+                    **stats
+                )
+
+    seconds, patches = timed(
+        lambda: crop_patch(frames, len(frames), landmarks[:len(frames)], get_mean_face_landmarks()), repeats
+    )
+    results["crop_patch"] = stage_result(seconds, len(patches))
+
+    seconds, _ = timed(lambda: save_video(patches, work_dir / "patches.mp4", fps=FPS), repeats)
+    results["save_video"] = stage_result(seconds, len(patches))
+    seconds, _ = timed(lambda: save_lip_movement(patches, work_dir / "patches.npy"), repeats)
+    results["save_lip_roi"] = stage_result(seconds, len(patches))
+
+    seconds, _ = timed(lambda: load_feature(str(work_dir / "patches.npy"), str(audio_path)), repeats)
+    results["load_feature"] = stage_result(seconds, len(patches))
+
+    for workers, pool in pools.items():
+        for mode in modes:
+            seconds, _ = timed(
+                lambda: extract_lip_movement(
+                    str(video_path), work_dir / "end_to_end.npy", landmark_pool=pool, landmark_mode=mode
+                ),
+                repeats,
+            )
+            results[f"end_to_end/{mode}/w{workers}"] = stage_result(seconds, num_frames)
+    return results
+
+
+def compare(results, previous_path):
+    with open(previous_path) as f:
+        previous = json.load(f)["results"]
+    print(f"\n📈 Speedup vs {previous_path} (>1 is faster)")
+    for length, stages in results.items():
+        for name, row in stages.items():
+            old = previous.get(length, {}).get(name)
+            if old and old.get("seconds") and row["seconds"]:
+                print(f"  {length:>6} frames  {name:<28} {old['seconds'] / row['seconds']:6.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the lip preprocessing on synthetic clips.")
+    parser.add_argument("--lengths", type=int, nargs="+", default=[50, 250, 1000], help="clip lengths in frames")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count()], help="landmark pool sizes")
+    parser.add_argument("--modes", nargs="+", default=["detect", "track", "adaptive"], help="landmark modes")
+    parser.add_argument("--detectors", nargs="+", default=["dlib"], help="face detector backends")
+    parser.add_argument("--model-dir", type=str, default=None, help=f"dlib / OpenCV model files (default: ${MODEL_DIR_ENV} or {get_model_dir()})")
+    parser.add_argument("--repeats", type=int, default=3, help="runs per stage, the best is kept")
+    parser.add_argument("--clip-dir", type=str, default=os.path.join(RESULTS_DIR, "clips"))
+    parser.add_argument("--out", type=str, default=None, help="results json (default: timestamped in benchmark_results/)")
+    parser.add_argument("--compare", type=str, default=None, help="previous results json to compare against")
+    args = parser.parse_args()
+    if args.model_dir:
+        # read by every model loader, including the landmark pool workers started below
+        os.environ[MODEL_DIR_ENV] = args.model_dir
+
+    os.makedirs(args.clip_dir, exist_ok=True)
+    out_path = args.out or os.path.join(RESULTS_DIR, time.strftime("preprocessing_%Y%m%d_%H%M%S.json"))
+    results = {}
+    pools = {workers: LandmarkPool(num_workers=workers) for workers in sorted(set(args.workers))}
+    try:
+        with tempfile.TemporaryDirectory() as work_dir:
+            for length in args.lengths:
+                print(f"⏱️ Benchmarking {length}-frame clip...")
+                video_path, audio_path, landmarks = make_clip(args.clip_dir, length)
+                results[str(length)] = bench_clip(
+                    video_path, audio_path, landmarks, pools, args.modes, args.detectors, args.repeats, Path(work_dir)
+                )
+                for name, row in results[str(length)].items():
+                    accuracy = ""
+                    if row.get("landmark_error") is not None:
+                        accuracy = f"  detected {row['detected_ratio']:.2f}  error {row['landmark_error']:.2f}px"
+                        if row.get("landmark_error_vs_detect") is not None:
+                            accuracy += f" ({row['landmark_error_vs_detect']:.2f}px vs detect)"
+                    print(f"  {name:<28} {row['seconds']:8.3f}s {row['fps'] or 0:10.1f} fps{accuracy}")
+    finally:
+        for pool in pools.values():
+            pool.close()
+
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    with open(out_path, "w") as f:
+        json.dump({
+            "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "machine": {"platform": platform.platform(), "processor": platform.processor(), "cpus": os.cpu_count()},
+            "config": vars(args),
+            "results": results,
+        }, f, indent=2)
+    print(f"💾 Results saved to {out_path}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+import os
+import argparse
+import numpy as np
+from src.dataset.feature_store import build_feature_store, SHARD_BYTES
+from src.dataset.lip_roi import find_lip_movement_files
+
+# Precompute the model inputs of every processed clip once; run_example.py then
+# reads them memory-mapped from FEATURE_STORE_DIR instead of running load_feature.
+PROCESSED_DIR = "C:/github/rw/AV-HuBERT-S2S/video_processed"
+AUDIO_SOURCE_DIR = "C:/github/rw/AV-HuBERT-S2S/GLips/lipread_files"
+FEATURE_STORE_DIR = "C:/github/rw/AV-HuBERT-S2S/feature_store"
+
+
+def find_clips(processed_dir, audio_source_dir):
+    """(key, lip movement path, wav path) per processed clip, keyed like run_example.py's `filename_base`."""
+    wavs = {}
+    for root, _, files in os.walk(audio_source_dir):
+        for f in files:
+            if f.endswith(".wav"):
+                wavs.setdefault(f[:-len(".wav")], os.path.join(root, f))
+    clips = []
+    for key, lip_path in find_lip_movement_files(processed_dir).items():
+        audio_path = wavs.get(key) or next((path for name, path in wavs.items() if name.startswith(key)), None)
+        if audio_path is None:
+            print(f"❌ Skipping {key}: audio file not found.")
+            continue
+        clips.append((key, lip_path, audio_path))
+    return clips
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the sharded feature store used by run_example.py.")
+    parser.add_argument("--processed-dir", type=str, default=PROCESSED_DIR)
+    parser.add_argument("--audio-dir", type=str, default=AUDIO_SOURCE_DIR)
+    parser.add_argument("--out", type=str, default=FEATURE_STORE_DIR)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--shard-mb", type=int, default=SHARD_BYTES >> 20)
+    parser.add_argument("--float16", action="store_true", help="store audio features as float16")
+    args = parser.parse_args()
+
+    clips = find_clips(args.processed_dir, args.audio_dir)
+    failed = build_feature_store(
+        args.out, clips, num_workers=args.workers, shard_bytes=args.shard_mb << 20,
+        audio_dtype=np.float16 if args.float16 else np.float32,
+    )
+    for key, error in failed.items():
+        print(f"❌ {key}: {error}")
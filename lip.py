@@ -1,14 +1,26 @@
 import os
 import shutil
 from itertools import islice
-from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from src.dataset.video_to_audio_lips import process_raw_data_for_avsr
+from src.dataset.cpu_budget import CpuBudget
+from src.dataset.landmark_cache import LandmarkCache
+from src.dataset.media_probe import prefetch_probes, load_probe_cache, save_probe_cache
+from src.dataset.session_seeds import SessionFaceSeeds, interleave_sessions
+from src.profiling import clip, profiling
 
 # Configuration
 LIPREAD_ROOT = "C:/github/rw/AV-HuBERT-S2S/GLips/lipread_files"
 TEMP_RAW_DIR = "C:/github/rw/AV-HuBERT-S2S/raw_face_videos"
 OUTPUT_DIR = "C:/github/rw/AV-HuBERT-S2S/video_processed"
-MAX_WORKERS = 10  # Adjust based on your CPU
+LANDMARK_CACHE_DIR = "C:/github/rw/AV-HuBERT-S2S/landmark_cache"
+PROBE_CACHE_FILE = "C:/github/rw/AV-HuBERT-S2S/probe_cache.json"
+CPU_CORES = None  # Cores the whole run may use (None = all); split between dlib workers and per-video work
+LANDMARK_MODE = "track"  # "detect" runs the face detector on every frame, "adaptive" skips near-static frames
+FACE_DETECTOR = "dlib"  # or "opencv_dnn" (res10 SSD model files in model-bin); compare with benchmark_preprocessing.py --detectors
+SEED_FROM_SESSION = True  # seed track mode with the face box of earlier clips of the same GLips session
+PROFILE_DIR = None  # e.g. "C:/github/rw/AV-HuBERT-S2S/profile" to write per-clip timings and a Chrome trace
 
 
 def prepare_directories():
@@ -40,22 +52,27 @@ def copy_test_videos(max_files_per_label=10):
 
 
 def should_skip(file):
-    return (
-        not file.endswith(".mp4") or
-        "_lip_movement" in file or
-        "_normalized_video" in file or
-        "_video_" in file
-    )
+    # intermediates live in the scratch space now, only outputs can show up here
+    return not file.endswith(".mp4") or "_lip_movement" in file
 
 
-def process_file(file):
+def process_file(file, landmark_pool=None, landmark_cache=None, face_seeds=None):
     video_path = os.path.join(TEMP_RAW_DIR, file)
     try:
         print(f"▶️ Processing: {file}")
-        result = process_raw_data_for_avsr(
-            input_file_path=video_path,
-            output_dir=OUTPUT_DIR
-        )
+        with clip(file):
+            result = process_raw_data_for_avsr(
+                input_file_path=video_path,
+                output_dir=OUTPUT_DIR,
+                landmark_pool=landmark_pool,
+                landmark_cache=landmark_cache,
+                landmark_mode=LANDMARK_MODE,
+                landmark_options={"detector": FACE_DETECTOR},
+                save_preview=False,
+                face_seed=face_seeds.get(file) if face_seeds is not None else None,
+            )
+        if face_seeds is not None:
+            face_seeds.update(file, result["face_rect"])
         print(f"✅ Done: {file}")
         return file, "success", result
     except Exception as e:
@@ -68,8 +85,35 @@ def run_preprocessing():
     files = [f for f in os.listdir(TEMP_RAW_DIR) if not should_skip(f)]
     print(f"📁 Found {len(files)} valid files to process in {TEMP_RAW_DIR}")
 
-    with ProcessPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        futures = {executor.submit(process_file, file): file for file in files}
+    # probe every file up front with overlapping ffprobe calls; the per-clip
+    # probes then hit the cache instead of starting a process each
+    print(f"🔎 Probing {len(files)} files ({load_probe_cache(PROBE_CACHE_FILE)} cached probes loaded)...")
+    probes = prefetch_probes([os.path.join(TEMP_RAW_DIR, f) for f in files])
+    save_probe_cache(PROBE_CACHE_FILE)
+    unreadable = [f for f in files if isinstance(probes[os.path.join(TEMP_RAW_DIR, f)], Exception)]
+    for file in unreadable:
+        print(f"⚠️ Skipping unreadable file: {file}")
+    files = [f for f in files if f not in unreadable]
+    face_seeds = None
+    if SEED_FROM_SESSION:
+        # round-robin over sessions, so earlier clips of a session are done before the next starts
+        files = interleave_sessions(files)
+        face_seeds = SessionFaceSeeds()
+
+    # one core budget for the run: pinned single-threaded dlib workers in one
+    # shared pool, and videos on threads (decoding/encoding happens in ffmpeg)
+    budget = CpuBudget(num_cores=CPU_CORES)
+    budget.apply()
+    print(f"🧮 {budget}")
+    with budget.landmark_pool() as landmark_pool, \
+            ThreadPoolExecutor(max_workers=budget.video_workers) as executor:
+        process = partial(
+            process_file,
+            landmark_pool=landmark_pool,
+            landmark_cache=LandmarkCache(LANDMARK_CACHE_DIR),
+            face_seeds=face_seeds,
+        )
+        futures = {executor.submit(process, file): file for file in files}
 
         for i, future in enumerate(as_completed(futures), start=1):
             file = futures[future]
@@ -85,4 +129,8 @@ def run_preprocessing():
 if __name__ == "__main__":
     prepare_directories()
     # copy_test_videos(max_files_per_label=10)
-    run_preprocessing()
+    if PROFILE_DIR:
+        with profiling(PROFILE_DIR):
+            run_preprocessing()
+    else:
+        run_preprocessing()
@@ -1,28 +1,38 @@
 import os
 import csv
 import torch
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from transformers import Speech2TextTokenizer
 from src.model.avhubert2text import AV2TextForConditionalGeneration
-from src.dataset.load_data import load_feature
+from src.dataset.feature_store import FeatureStore
+from src.dataset.lip_roi import find_lip_movement_files
+from src.dataset.prefetch import Prefetcher, load_batch
+from src.profiling import clip, stage, profile_module, profiling_from_env
 
 # Paths
 PROCESSED_DIR = "C:/github/rw/AV-HuBERT-S2S/video_processed"
 AUDIO_SOURCE_DIR = "C:/github/rw/AV-HuBERT-S2S/GLips/lipread_files"
 CSV_OUTPUT_PATH = "C:/github/rw/AV-HuBERT-S2S/inference_results.csv"
 LANGUAGE = "de"
-MAX_WORKERS = 16    # Keep at 1 unless you know your GPU can handle more
+LOADER_WORKERS = 4  # processes decoding and featurising upcoming batches while the GPU runs
+PREFETCH_DEPTH = 4  # batches loading or waiting at most; bounds host memory
+BATCH_SIZE = 8  # clips per generate call, padded to the longest one; results match batch size 1
+UINT8_VIDEO = True  # queue the uint8 lip ROI (4x smaller), the model's video frontend normalizes it
+FEATURE_STORE_DIR = None  # e.g. "C:/github/rw/AV-HuBERT-S2S/feature_store", filled by build_feature_store.py
 
-# Load model
-print("📦 Loading model...")
-model_name = f"nguyenvulebinh/AV-HuBERT-MuAViC-{LANGUAGE}"
-model = AV2TextForConditionalGeneration.from_pretrained(model_name, cache_dir="./model-bin")
-tokenizer = Speech2TextTokenizer.from_pretrained(model_name, cache_dir="./model-bin")
-model = model.cuda().eval()
+def load_model():
+    # only the main process loads the model; loader processes import this module without it
+    print("📦 Loading model...")
+    model_name = f"nguyenvulebinh/AV-HuBERT-MuAViC-{LANGUAGE}"
+    model = AV2TextForConditionalGeneration.from_pretrained(model_name, cache_dir="./model-bin")
+    tokenizer = Speech2TextTokenizer.from_pretrained(model_name, cache_dir="./model-bin")
+    model = model.cuda().eval()
+    profile_module(model.get_encoder(), "encoder")
+    return model, tokenizer
 
-def run_inference(file):
-    filename_base = file.replace("_lip_movement.mp4", "")
-    video_path = os.path.join(PROCESSED_DIR, file)
+def find_clip(filename_base, video_path, feature_store=None):
+    """(filename_base, video_path, audio_path) of a processed clip, or None when its audio is missing."""
+    if feature_store is not None and filename_base in feature_store:
+        return filename_base, video_path, None
 
     # Find audio file
     audio_path = None
@@ -37,43 +47,70 @@ def run_inference(file):
     if not audio_path or not os.path.exists(audio_path):
         print(f"❌ Skipping {filename_base}: audio file not found.")
         return None
+    return filename_base, video_path, audio_path
 
+def run_inference(model, tokenizer, names, batch):
+    """Transcribe a loaded batch of clips with one padded `generate` call per condition."""
     try:
-        sample = load_feature(video_path, audio_path)
-        audio_feats = sample["audio_source"].cuda()
-        video_feats = sample["video_source"].cuda()
-        attention_mask = torch.BoolTensor(audio_feats.size(0), audio_feats.size(-1)).fill_(False).cuda()
+        with clip(" ".join(names)):
+            audio_feats = batch["audio_source"].cuda(non_blocking=True)
+            video_feats = batch["video_source"].cuda(non_blocking=True)
+            attention_mask = (~batch["padding_mask"]).cuda(non_blocking=True)
 
-        output_audio = model.generate(audio_feats, attention_mask=attention_mask, video=torch.zeros_like(video_feats))
-        output_video = model.generate(torch.zeros_like(audio_feats), attention_mask=None, video=video_feats)
-        output_both = model.generate(audio_feats, attention_mask=attention_mask, video=video_feats)
+            # blank video as already normalized float zeros; uint8 zeros would normalize to -mean/std
+            blank_video = torch.zeros_like(video_feats, dtype=torch.float32)
+            with stage("generate", condition="audio", clips=len(names)):
+                output_audio = model.generate(audio_feats, attention_mask=attention_mask, video=blank_video)
+            with stage("generate", condition="video", clips=len(names)):
+                output_video = model.generate(torch.zeros_like(audio_feats), attention_mask=attention_mask, video=video_feats)
+            with stage("generate", condition="audio_video", clips=len(names)):
+                output_both = model.generate(audio_feats, attention_mask=attention_mask, video=video_feats)
 
-        decoded_audio = tokenizer.batch_decode(output_audio, skip_special_tokens=True)[0]
-        decoded_video = tokenizer.batch_decode(output_video, skip_special_tokens=True)[0]
-        decoded_both = tokenizer.batch_decode(output_both, skip_special_tokens=True)[0]
+        decoded_audio = tokenizer.batch_decode(output_audio, skip_special_tokens=True)
+        decoded_video = tokenizer.batch_decode(output_video, skip_special_tokens=True)
+        decoded_both = tokenizer.batch_decode(output_both, skip_special_tokens=True)
 
-        print(f"✅ {filename_base}")
-        return {
-            "filename": filename_base,
-            "audio_only_prediction": decoded_audio,
-            "video_only_prediction": decoded_video,
-            "audio_video_prediction": decoded_both
-        }
+        results = []
+        for filename_base, audio_text, video_text, both_text in zip(names, decoded_audio, decoded_video, decoded_both):
+            print(f"✅ {filename_base}")
+            results.append({
+                "filename": filename_base,
+                "audio_only_prediction": audio_text,
+                "video_only_prediction": video_text,
+                "audio_video_prediction": both_text
+            })
+        return results
     except Exception as e:
-        print(f"❌ Error processing {filename_base}: {e}")
-        return None
+        print(f"❌ Error processing {', '.join(names)}: {e}")
+        return []
 
 if __name__ == "__main__":
+    model, tokenizer = load_model()
+    feature_store = FeatureStore(FEATURE_STORE_DIR) if FEATURE_STORE_DIR else None
     print("⚙️ Starting inference...")
-    files = [f for f in os.listdir(PROCESSED_DIR) if f.endswith("_lip_movement.mp4")]
+    # one file per clip, the lossless .npy ROI over an mp4 preview of the same clip
+    lip_files = find_lip_movement_files(PROCESSED_DIR)
+    clips = [found for found in (find_clip(key, path, feature_store) for key, path in lip_files.items()) if found]
+    batches = [
+        (clips[start:start + BATCH_SIZE], FEATURE_STORE_DIR, UINT8_VIDEO)
+        for start in range(0, len(clips), BATCH_SIZE)
+    ]
     results = []
 
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        futures = [executor.submit(run_inference, file) for file in files]
-        for future in as_completed(futures):
-            result = future.result()
-            if result:
-                results.append(result)
+    # AVSR_PROFILE=<dir> writes per-clip stage timings and a Chrome trace
+    with profiling_from_env(cuda_sync=True), Prefetcher(
+        load_batch, batches, num_workers=LOADER_WORKERS, depth=PREFETCH_DEPTH
+    ) as prefetcher:
+        for _, loaded, error in prefetcher:
+            if error is not None:
+                print(f"❌ Error loading batch: {error}")
+                continue
+            names, batch, failed = loaded
+            for filename_base, load_error in failed.items():
+                print(f"❌ Error loading {filename_base}: {load_error}")
+            if batch is not None:
+                results.extend(run_inference(model, tokenizer, names, batch))
+    print(f"⏳ Waited {prefetcher.wait_seconds:.1f}s for input in total")
 
     print(f"\n💾 Saving results to {CSV_OUTPUT_PATH}")
     with open(CSV_OUTPUT_PATH, mode="w", newline="", encoding="utf-8") as csvfile:
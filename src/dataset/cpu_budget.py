@@ -0,0 +1,81 @@
+import os
+import math
+import cv2
+from threadpoolctl import threadpool_limits
+
+BLAS_THREAD_ENV = (
+    "OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS", "NUMEXPR_NUM_THREADS",
+)
+
+
+def available_cores():
+    """Cores this process may run on (all cores where affinity isn't supported)."""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count()))
+
+
+def limit_threads(num_threads=1):
+    """Cap the OpenCV thread pool and the BLAS/OpenMP pools already loaded in this process.
+    numpy's BLAS is loaded long before this runs (and forked workers inherit it),
+    so those pools are resized through `threadpool_limits`; the environment
+    variables only cover processes started later that load BLAS themselves.
+    """
+    for name in BLAS_THREAD_ENV:
+        os.environ[name] = str(num_threads)
+    threadpool_limits(limits=num_threads)
+    cv2.setNumThreads(num_threads)
+
+
+def pin_to_cores(cores):
+    """Restrict this process to `cores`; a no-op where affinity isn't supported (Windows, macOS)."""
+    if cores and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+
+
+class CpuBudget(object):
+    """One core budget for a batch preprocessing run.
+
+    The cores are split once: `landmark_cores` get one pinned, single-threaded
+    dlib worker each, `video_cores` run everything per video (the ffmpeg decode
+    and encode processes, cropping in the main process). Every thread pool
+    (OpenCV, BLAS, ffmpeg) is capped so nothing spawns threads outside the
+    budget. `video_workers` videos are in flight at once; their threads
+    mostly wait on ffmpeg pipes and the landmark pool, so there are more of
+    them than video cores.
+    """
+
+    def __init__(self, num_cores=None, video_share=0.25, videos_per_core=2):
+        cores = available_cores()
+        self.cores = cores[:num_cores] if num_cores else cores
+        if len(self.cores) == 1:
+            self.video_cores = self.landmark_cores = self.cores
+        else:
+            num_video_cores = min(max(1, math.ceil(len(self.cores) * video_share)), len(self.cores) - 1)
+            self.video_cores = self.cores[:num_video_cores]
+            self.landmark_cores = self.cores[num_video_cores:]
+        self.landmark_workers = len(self.landmark_cores)
+        self.video_workers = videos_per_core * len(self.video_cores)
+        self.ffmpeg_threads = 1
+
+    def apply(self):
+        """Pin this process to the video cores and cap its thread pools and ffmpeg's."""
+        from . import video_to_audio_lips
+
+        limit_threads(1)
+        video_to_audio_lips.FFMPEG_THREADS = self.ffmpeg_threads
+        pin_to_cores(self.video_cores)  # inherited by the ffmpeg processes started from here
+
+    def landmark_pool(self, **kwargs):
+        """A `LandmarkPool` with one worker pinned to each landmark core."""
+        from .landmark_pool import LandmarkPool
+
+        return LandmarkPool(num_workers=self.landmark_workers, worker_cores=self.landmark_cores, **kwargs)
+
+    def __repr__(self):
+        return (
+            f"{self.__class__.__name__}(cores={len(self.cores)}, landmark_workers={self.landmark_workers}, "
+            f"video_cores={len(self.video_cores)}, video_workers={self.video_workers}, "
+            f"ffmpeg_threads={self.ffmpeg_threads})"
+        )
@@ -0,0 +1,163 @@
+import os
+import abc
+import time
+import threading
+import cv2
+import dlib
+import numpy as np
+from pathlib import Path
+
+MODEL_DIR = Path("C:/github/rw/AV-HuBERT-S2S/model-bin")  # same place as the dlib shape predictor
+MODEL_DIR_ENV = "AVSR_MODEL_DIR"  # overrides MODEL_DIR for every model loader, e.g. on a benchmark box
+
+_DETECTORS = {}
+_DETECTORS_LOCK = threading.Lock()
+
+
+def get_model_dir():
+    """$AVSR_MODEL_DIR, else MODEL_DIR; read at load time, so it can be set after import."""
+    return Path(os.environ.get(MODEL_DIR_ENV) or MODEL_DIR)
+
+
+class FaceDetector(abc.ABC):
+    """Batched face detection: gray frames in, one face box (or None) per frame out.
+
+    Boxes are `dlib.rectangle`s in full-frame coordinates, so any backend can
+    feed the dlib shape predictor. `detect_batch` keeps count of frames and
+    time spent, see `throughput`.
+    """
+
+    name = None
+
+    def __init__(self):
+        self.frames = 0
+        self.seconds = 0.0
+
+    @abc.abstractmethod
+    def _detect_batch(self, gray_frames, upsample):
+        """(left, top, right, bottom) of one face per frame, or None, on `gray_frames`' scale."""
+
+    def detect_batch(self, gray_frames, scale=1.0, upsample=1):
+        """Face box per frame, detected on frames downscaled by `scale`.
+        `upsample` is dlib's pyramid upsampling; other backends ignore it.
+        """
+        start = time.perf_counter()
+        small = gray_frames
+        if scale != 1.0:
+            small = [
+                cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+                for gray in gray_frames
+            ]
+        rects = [
+            None if rect is None else dlib.rectangle(
+                int(rect[0] / scale), int(rect[1] / scale), int(rect[2] / scale), int(rect[3] / scale)
+            )
+            for rect in self._detect_batch(small, upsample)
+        ]
+        self.seconds += time.perf_counter() - start
+        self.frames += len(gray_frames)
+        return rects
+
+    @property
+    def throughput(self):
+        """Frames per second measured over every `detect_batch` call so far."""
+        return self.frames / self.seconds if self.seconds else None
+
+
+class DlibFaceDetector(FaceDetector):
+    """dlib's HOG frontal face detector, frame by frame; the last detected face wins."""
+
+    name = "dlib"
+
+    def __init__(self):
+        super().__init__()
+        self.detector = dlib.get_frontal_face_detector()
+
+    def _detect_batch(self, gray_frames, upsample):
+        rects = []
+        for gray in gray_frames:
+            faces = self.detector(gray, upsample)
+            face = faces[-1] if len(faces) else None
+            rects.append(None if face is None else (face.left(), face.top(), face.right(), face.bottom()))
+        return rects
+
+
+class OpenCVDnnFaceDetector(FaceDetector):
+    """OpenCV DNN res10 SSD face detector, one forward pass per batch of frames.
+
+    Needs `deploy.prototxt` and `res10_300x300_ssd_iter_140000.caffemodel` in
+    `model_dir`. Its boxes include the forehead while the dlib shape predictor
+    was trained on the lower, squarer HOG boxes, so boxes are squared and
+    moved down by `shift` of their size before being handed on.
+    """
+
+    name = "opencv_dnn"
+    INPUT_SIZE = (300, 300)
+    MEAN = (104.0, 177.0, 123.0)
+
+    def __init__(self, model_dir=None, confidence=0.5, shift=0.1):
+        super().__init__()
+        model_dir = Path(model_dir or get_model_dir())
+        self.net = cv2.dnn.readNetFromCaffe(
+            str(model_dir / "deploy.prototxt"), str(model_dir / "res10_300x300_ssd_iter_140000.caffemodel")
+        )
+        self.confidence = confidence
+        self.shift = shift
+
+    def _detect_batch(self, gray_frames, upsample):
+        if not len(gray_frames):
+            return []
+        blob = cv2.dnn.blobFromImages(
+            [cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR) for gray in gray_frames],
+            1.0, self.INPUT_SIZE, self.MEAN,
+        )
+        self.net.setInput(blob)
+        # rows of [image_id, label, confidence, x0, y0, x1, y1] with relative coordinates
+        detections = self.net.forward().reshape(-1, 7)
+        detections = detections[detections[:, 2] >= self.confidence]
+        rects = []
+        for idx, gray in enumerate(gray_frames):
+            faces = detections[detections[:, 0] == idx]
+            if not len(faces):
+                rects.append(None)
+                continue
+            height, width = gray.shape[:2]
+            x0, y0, x1, y1 = faces[np.argmax(faces[:, 2]), 3:7] * [width, height, width, height]
+            size = ((x1 - x0) + (y1 - y0)) / 2
+            cx, cy = (x0 + x1) / 2, (y0 + y1) / 2 + self.shift * size
+            rects.append((cx - size / 2, cy - size / 2, cx + size / 2, cy + size / 2))
+        return rects
+
+
+FACE_DETECTORS = {
+    DlibFaceDetector.name: DlibFaceDetector,
+    OpenCVDnnFaceDetector.name: OpenCVDnnFaceDetector,
+}
+
+
+def get_face_detector(name="dlib"):
+    """The process-wide instance of a face detector backend, loaded on first use."""
+    if name not in FACE_DETECTORS:
+        raise ValueError(f"Unknown face detector `{name}`, expected one of {sorted(FACE_DETECTORS)}")
+    # pool tasks and chunk threads may ask for the same backend at once, load it only once
+    with _DETECTORS_LOCK:
+        if name not in _DETECTORS:
+            _DETECTORS[name] = FACE_DETECTORS[name]()
+        return _DETECTORS[name]
+
+
+def benchmark_face_detectors(gray_frames, names=None, batch_size=16, scale=1.0):
+    """Throughput (frames/sec) and detection rate of each backend on the same frames."""
+    results = {}
+    for name in names or sorted(FACE_DETECTORS):
+        detector = FACE_DETECTORS[name]()  # fresh instance, so earlier calls don't count
+        found = 0
+        for start in range(0, len(gray_frames), batch_size):
+            rects = detector.detect_batch(gray_frames[start:start + batch_size], scale=scale)
+            found += sum(rect is not None for rect in rects)
+        results[name] = {
+            "fps": detector.throughput,
+            "detected_ratio": found / max(len(gray_frames), 1),
+        }
+        print(f"🧪 {name}: {detector.throughput or 0:.1f} frames/s, faces in {found}/{len(gray_frames)} frames")
+    return results
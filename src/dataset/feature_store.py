@@ -0,0 +1,183 @@
+import os
+import json
+import uuid
+import numpy as np
+import torch
+from pathlib import Path
+from scipy.io import wavfile
+from concurrent.futures import ProcessPoolExecutor
+
+from .utils import load_video
+from .load_data import (
+    load_audio_features, align_audio_features, to_audio_source, to_video_source, video_features_from_frames,
+    to_uint8_video_source, no_padding,
+)
+
+INDEX_FILE = "index.json"
+SHARD_BYTES = 1 << 30  # a shard is closed once it grows past this size
+ALIGNMENT = 64  # every array starts on a 64-byte boundary of its shard
+
+
+def clip_arrays(video_path, audio_path, audio_dtype=np.float32):
+    """What the store keeps for a clip: the layer-normed [F*4, T] audio input and the (T, H, W) uint8 lip ROI.
+    float16 audio halves its size at a small precision cost.
+    """
+    frames = np.ascontiguousarray(load_video(video_path))
+    sample_rate, wav_data = wavfile.read(audio_path)
+    audio_feats = align_audio_features(load_audio_features(wav_data, sample_rate), len(frames))
+    audio = to_audio_source(audio_feats)[0].numpy().astype(audio_dtype)
+    return {"audio": audio, "video": frames}
+
+
+class FeatureShardWriter(object):
+    """Appends clips' arrays to shard files of about `shard_bytes` and collects their index entries.
+
+    Shard names start with a random id, so several writers (processes) can
+    fill the same store directory without coordinating.
+    """
+
+    def __init__(self, root, shard_bytes=SHARD_BYTES):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.shard_bytes = shard_bytes
+        self.prefix = uuid.uuid4().hex[:8]
+        self.num_shards = 0
+        self.index = {}
+        self._file = None
+        self._shard = None
+
+    def _open_shard(self):
+        self.close()
+        self._shard = f"shard_{self.prefix}_{self.num_shards:04d}.bin"
+        self._file = open(self.root / self._shard, "wb")
+        self.num_shards += 1
+
+    def add(self, key, arrays):
+        if self._file is None or self._file.tell() >= self.shard_bytes:
+            self._open_shard()
+        entry = {}
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            self._file.write(b"\0" * (-self._file.tell() % ALIGNMENT))
+            entry[name] = {
+                "shard": self._shard, "offset": self._file.tell(),
+                "shape": list(array.shape), "dtype": array.dtype.str,
+            }
+            self._file.write(array.tobytes())
+        self.index[key] = entry
+        return entry
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_index(root):
+    path = Path(root) / INDEX_FILE
+    if not path.exists():
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_index(root, index):
+    path = Path(root) / INDEX_FILE
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(index, f)
+    os.replace(tmp_path, path)
+
+
+class FeatureStore(object):
+    """Read side of a feature store: every array is a memory-mapped view into its shard.
+
+    `load_feature` returns the same tensors as `load_data.load_feature`, with
+    only the video normalization (cheap and kept out of the store so the ROI
+    stays uint8) left to compute, or left to the model with `uint8_video`.
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.index = read_index(root)
+        self._shards = {}
+
+    def __contains__(self, key):
+        return key in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+    def keys(self):
+        return self.index.keys()
+
+    def _shard(self, name):
+        if name not in self._shards:
+            self._shards[name] = np.memmap(self.root / name, dtype=np.uint8, mode="r")
+        return self._shards[name]
+
+    def _array(self, entry):
+        dtype = np.dtype(entry["dtype"])
+        size = int(np.prod(entry["shape"])) * dtype.itemsize
+        data = self._shard(entry["shard"])[entry["offset"]:entry["offset"] + size]
+        return data.view(dtype).reshape(entry["shape"])
+
+    def get(self, key):
+        """{"audio": [F*4, T], "video": (T, H, W) uint8} read-only memory-mapped arrays of a clip."""
+        return {name: self._array(entry) for name, entry in self.index[key].items()}
+
+    def load_feature(self, key, uint8_video=False):
+        arrays = self.get(key)
+        audio = torch.from_numpy(arrays["audio"].astype(np.float32)).unsqueeze(0)  # [1, F, T]
+        if uint8_video:
+            video = to_uint8_video_source(arrays["video"])
+        else:
+            video = to_video_source(video_features_from_frames(arrays["video"]))
+        return {
+            "video_source": video,
+            "audio_source": audio,
+            "padding_mask": no_padding(1, audio.size(-1)),
+        }
+
+
+def _write_clips(root, clips, shard_bytes, audio_dtype):
+    failed = {}
+    with FeatureShardWriter(root, shard_bytes) as writer:
+        for key, video_path, audio_path in clips:
+            try:
+                writer.add(key, clip_arrays(video_path, audio_path, audio_dtype))
+            except Exception as e:
+                failed[key] = str(e)
+    return writer.index, failed
+
+
+def build_feature_store(root, clips, num_workers=None, shard_bytes=SHARD_BYTES, audio_dtype=np.float32):
+    """Fill the store at `root` from (key, video_path, audio_path) triples, skipping keys it already has.
+
+    Each worker process computes its share of clips and writes its own shards;
+    the index is merged and rewritten once at the end. Returns {key: error}
+    for the clips that failed.
+    """
+    index = read_index(root)
+    todo = [clip for clip in clips if clip[0] not in index]
+    num_workers = max(1, min(num_workers or os.cpu_count(), len(todo)))
+    failed = {}
+    if todo:
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            futures = [
+                executor.submit(_write_clips, root, todo[worker::num_workers], shard_bytes, audio_dtype)
+                for worker in range(num_workers)
+            ]
+            for future in futures:
+                worker_index, worker_failed = future.result()
+                index.update(worker_index)
+                failed.update(worker_failed)
+        write_index(root, index)
+    print(f"🗄️ Feature store at {root}: {len(todo) - len(failed)} clips added, {len(index)} total, {len(failed)} failed")
+    return failed
@@ -0,0 +1,89 @@
+import os
+import json
+import hashlib
+import threading
+import numpy as np
+from pathlib import Path
+
+NUM_LANDMARKS = 68
+
+_DIGEST_MEMO = {}
+_DIGEST_LOCK = threading.Lock()
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """sha1 of a file's content, memoized per (path, mtime, size)."""
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    with _DIGEST_LOCK:
+        if memo_key in _DIGEST_MEMO:
+            return _DIGEST_MEMO[memo_key]
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            digest.update(block)
+    with _DIGEST_LOCK:
+        _DIGEST_MEMO[memo_key] = digest.hexdigest()
+    return _DIGEST_MEMO[memo_key]
+
+
+def empty_landmarks(num_frames):
+    """Dense landmark layout used throughout: (T, 68, 2) float32 coordinates and a (T,) validity mask."""
+    return (
+        np.zeros((num_frames, NUM_LANDMARKS, 2), dtype=np.float32),
+        np.zeros(num_frames, dtype=bool),
+    )
+
+
+class LandmarkCache(object):
+    """Content-addressed on-disk store of per-frame face landmarks.
+
+    Entries are keyed by the hash of the source video bytes plus the settings
+    that affect detection (decode size, fps, detector options), and hold the
+    (T, 68, 2) landmarks with (T,) validity and skipped masks as a compressed npz. Crop
+    parameters are not part of the key, so re-cropping never re-runs detection.
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def key(self, video_path, **settings):
+        settings = json.dumps(settings, sort_keys=True, default=str)
+        return hashlib.sha1(
+            f"{file_digest(video_path)}:{settings}".encode("utf-8")
+        ).hexdigest()
+
+    def path(self, key):
+        # shard by key prefix so no single directory grows huge
+        return self.root / key[:2] / f"{key}.npz"
+
+    def get(self, key):
+        """Return (landmarks, valid, skipped) for `key`, or None on a miss."""
+        path = self.path(key)
+        if not path.exists():
+            return None
+        try:
+            with np.load(path) as entry:
+                valid = entry["valid"]
+                # entries written before frame skipping existed have no skipped mask
+                skipped = entry["skipped"] if "skipped" in entry.files else np.zeros_like(valid)
+                return entry["landmarks"].astype(np.float32), valid, skipped
+        except Exception as e:
+            print(f"⚠️ Ignoring unreadable landmark cache entry {path}: {e}")
+            return None
+
+    def put(self, key, landmarks, valid, skipped=None):
+        path = self.path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.stem}.{os.getpid()}.{threading.get_ident()}.tmp.npz")
+        # detected coordinates are whole pixels of 640x480 frames, so int16 is lossless
+        valid = np.asarray(valid, dtype=bool)
+        skipped = np.zeros_like(valid) if skipped is None else np.asarray(skipped, dtype=bool)
+        np.savez_compressed(
+            tmp_path, landmarks=np.asarray(landmarks).astype(np.int16), valid=valid, skipped=skipped
+        )
+        os.replace(tmp_path, path)  # atomic, so concurrent writers never see partial files
+
+    def __contains__(self, key):
+        return self.path(key).exists()
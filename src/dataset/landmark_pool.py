@@ -0,0 +1,198 @@
+import os
+import atexit
+import threading
+import multiprocessing
+import cv2
+import numpy as np
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait
+from multiprocessing import shared_memory
+from tqdm import tqdm
+
+from .landmark_cache import empty_landmarks
+from .cpu_budget import limit_threads, pin_to_cores
+
+FRAME_SHAPE = (480, 640)  # gray version of the frames produced by `stream_normalized_frames`
+
+_WORKER_STATE = {}
+_DEFAULT_POOL = None
+_DEFAULT_POOL_LOCK = threading.Lock()
+
+
+def _init_worker(shm_name, num_slots, frame_shape, worker_cores=None, worker_counter=None):
+    # one worker is one core of detection, so keep OpenCV / BLAS from fanning out
+    limit_threads(1)
+    if worker_cores:
+        with worker_counter.get_lock():
+            worker_idx = worker_counter.value
+            worker_counter.value += 1
+        pin_to_cores([worker_cores[worker_idx % len(worker_cores)]])
+    # the shape predictor is loaded once per worker, up front; the face detector
+    # backend is created on its first task (`get_face_detector`)
+    from .video_to_audio_lips import detect_landmarks, get_lip_models
+    get_lip_models()
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    _WORKER_STATE["shm"] = shm
+    _WORKER_STATE["frames"] = np.ndarray(
+        (num_slots, *frame_shape), dtype=np.uint8, buffer=shm.buf
+    )
+    _WORKER_STATE["detect"] = detect_landmarks
+
+
+def _detect_slots(slot_ids, mode, options):
+    frames, detect = _WORKER_STATE["frames"], _WORKER_STATE["detect"]
+    return detect([frames[slot] for slot in slot_ids], mode=mode, **options)
+
+
+class LandmarkPool(object):
+    """Long-lived pool of landmark workers fed through a shared-memory ring buffer.
+
+    Workers load the dlib models once and read gray frames straight from
+    shared slots, so only slot indices and the (68, 2) results cross process
+    boundaries. Each task is a run of consecutive frames, which lets the
+    "track" landmark mode follow the face within a task. Tasks are always
+    `chunk_size` frames (only the last one of a call may be shorter): their
+    slots are reserved up front, so task boundaries, and with them the
+    landmarks, don't depend on the pool size or on other callers. A single
+    pool is meant to be reused for every video of a batch run, and `detect`
+    may be called from several threads at once. With
+    `worker_cores` (see `CpuBudget`) each worker is pinned to one of those cores.
+    """
+
+    def __init__(self, num_workers=None, chunk_size=4, slots_per_worker=32, frame_shape=FRAME_SHAPE, worker_cores=None):
+        self.num_workers = num_workers or os.cpu_count()
+        self.chunk_size = chunk_size
+        self.frame_shape = tuple(frame_shape)
+        self.num_slots = self.num_workers * slots_per_worker
+        self._shm = shared_memory.SharedMemory(
+            create=True, size=self.num_slots * int(np.prod(self.frame_shape))
+        )
+        self._frames = np.ndarray(
+            (self.num_slots, *self.frame_shape), dtype=np.uint8, buffer=self._shm.buf
+        )
+        self._free_slots = list(range(self.num_slots))
+        self._slots_changed = threading.Condition()
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.num_workers,
+            initializer=_init_worker,
+            initargs=(
+                self._shm.name, self.num_slots, self.frame_shape,
+                list(worker_cores or []), multiprocessing.Value("i", 0),
+            ),
+        )
+
+    def detect(self, frames, mode="detect", chunk_size=None, desc="Detecting Lip Movement", seed_rect=None, **options):
+        """Detect landmarks for an iterable of bgr frames, keeping input order.
+        `mode` and `options` are forwarded to `detect_landmarks` for every run of
+        `chunk_size` frames. A `seed_rect` (see `track_landmarks`) only goes to
+        the run holding the first frame; later runs start from a keyframe
+        detection as usual. Returns the (T, 68, 2) float32 landmarks, the (T,)
+        validity and skipped masks and the summed stats.
+        """
+        chunk_size = chunk_size or self.chunk_size
+        if chunk_size > self.num_slots:
+            raise ValueError(f"Task of {chunk_size} frames doesn't fit in the pool's {self.num_slots} slots")
+        landmarks, valid, skipped, pending, chunk, reserved = [], [], [], deque(), [], []
+        stats = {"frames": 0, "detector_calls": 0, "skipped": 0, "detector_seconds": 0.0}
+
+        def submit():
+            nonlocal seed_rect
+            task_options = options if seed_rect is None else dict(options, seed_rect=seed_rect)
+            seed_rect = None  # only the first run starts from the seed
+            pending.append(
+                (list(chunk), self._executor.submit(_detect_slots, list(chunk), mode, task_options))
+            )
+            chunk.clear()
+
+        def collect():
+            slots, future = pending.popleft()
+            try:
+                chunk_landmarks, chunk_valid, chunk_skipped, chunk_stats = future.result()
+                landmarks.append(chunk_landmarks)
+                valid.append(chunk_valid)
+                skipped.append(chunk_skipped)
+                for key in stats:
+                    stats[key] += chunk_stats[key]
+            finally:
+                self._release_slots(slots)
+
+        def reserve_task():
+            # the slots of a whole task at once, so a task is never cut short for lack of slots;
+            # our own finished tasks are collected first, only a caller holding nothing blocks
+            while True:
+                slots = self._reserve_slots(chunk_size, block=False)
+                if slots is not None:
+                    return slots
+                if pending:
+                    collect()
+                else:
+                    return self._reserve_slots(chunk_size, block=True)
+
+        try:
+            for frame in tqdm(frames, desc=desc, leave=False):
+                if frame.shape[:2] != self.frame_shape:
+                    raise ValueError(
+                        f"Frame shape {frame.shape} doesn't match pool frame shape {self.frame_shape}"
+                    )
+                if not reserved:
+                    reserved = reserve_task()
+                slot = reserved.pop()
+                # same (RGB-weighted) conversion `detect_landmark` has always used
+                cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY, dst=self._frames[slot])
+                chunk.append(slot)
+                if len(chunk) == chunk_size:
+                    submit()
+            if chunk:
+                submit()
+            while pending:
+                collect()
+        finally:
+            # only reached with leftovers when something failed midway
+            wait([future for _, future in pending])
+            self._release_slots(reserved + chunk + [slot for slots, _ in pending for slot in slots])
+        if not landmarks:
+            return empty_landmarks(0) + (np.zeros(0, dtype=bool), stats)
+        return np.concatenate(landmarks), np.concatenate(valid), np.concatenate(skipped), stats
+
+    def _reserve_slots(self, count, block):
+        with self._slots_changed:
+            if block:
+                self._slots_changed.wait_for(lambda: len(self._free_slots) >= count)
+            elif len(self._free_slots) < count:
+                return None
+            slots = self._free_slots[-count:][::-1]  # popped from the end, used in ascending order
+            del self._free_slots[-count:]
+            return slots
+
+    def _release_slots(self, slots):
+        if not slots:
+            return
+        with self._slots_changed:
+            self._free_slots.extend(slots)
+            self._slots_changed.notify_all()
+
+    def close(self):
+        if self._executor is None:
+            return
+        self._executor.shutdown()
+        self._executor = None
+        del self._frames
+        self._shm.close()
+        self._shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def get_landmark_pool(num_workers=None):
+    """Return the process-wide landmark pool, creating it on first use."""
+    global _DEFAULT_POOL
+    with _DEFAULT_POOL_LOCK:
+        if _DEFAULT_POOL is None:
+            _DEFAULT_POOL = LandmarkPool(num_workers=num_workers)
+            atexit.register(_DEFAULT_POOL.close)
+        return _DEFAULT_POOL
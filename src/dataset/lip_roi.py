@@ -0,0 +1,165 @@
+import os
+import cv2
+import struct
+import warnings
+import numpy as np
+from pathlib import Path
+
+LIP_ROI_SUFFIX = ".npy"
+LIP_MOVEMENT_SUFFIXES = ("_lip_movement.npy", "_lip_movement.mp4")  # lossless ROI first, mp4 previews from older runs
+NPY_HEADER_SIZE = 128  # fixed-size npy v1.0 header, rewritten with the frame count on close
+
+
+def _npy_header(shape):
+    header = "{'descr': '|u1', 'fortran_order': False, 'shape': %r, }" % (tuple(shape),)
+    header = header.ljust(NPY_HEADER_SIZE - 10 - 1) + "\n"
+    if len(header) != NPY_HEADER_SIZE - 10:
+        raise ValueError(f"Shape {shape} doesn't fit in the npy header")
+    return b"\x93NUMPY\x01\x00" + struct.pack("<H", len(header)) + header.encode("latin1")
+
+
+class LipRoiWriter(object):
+    """Stream lip ROI frames into a lossless uint8 gray `.npy` file.
+
+    Frames are appended as they come (colour frames are converted to gray) and
+    the frame count is patched into the header on close, so the result is a
+    plain npy that `load_lip_roi` can memory-map. The file only appears under
+    its final name once complete, and not at all when no frame was written
+    (an empty or undecodable clip).
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.part")
+        self.frame_shape = None
+        self.num_frames = 0
+        self.error = None
+        self._file = open(self.tmp_path, "wb")
+        self._file.write(b"\0" * NPY_HEADER_SIZE)
+
+    def write(self, frame):
+        if frame.ndim == 3:
+            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        if self.frame_shape is None:
+            self.frame_shape = frame.shape
+        elif frame.shape != self.frame_shape:
+            raise ValueError(f"Frame shape {frame.shape} doesn't match {self.frame_shape}")
+        self._file.write(np.ascontiguousarray(frame, dtype=np.uint8).tobytes())
+        self.num_frames += 1
+
+    def passthrough(self, frames):
+        """Write every frame while handing it on (e.g. to `save_video` for a preview).
+        A failure producing or writing a frame is kept in `error`, so `close` refuses
+        to commit the truncated file even if the consumer swallowed the exception.
+        """
+        try:
+            for frame in frames:
+                self.write(frame)
+                yield frame
+        except Exception as e:
+            self.error = e
+            raise
+
+    def close(self):
+        if self._file is None:
+            return
+        if self.error is not None:
+            self.abort()
+            raise RuntimeError(f"Lip ROI {self.path} is incomplete after {self.num_frames} frames") from self.error
+        if not self.num_frames:
+            self.abort()
+            warnings.warn(f"Lip ROI `{self.path.stem}` has no frames... skipping!!")
+            return
+        self._file.seek(0)
+        self._file.write(_npy_header((self.num_frames, *(self.frame_shape or (0, 0)))))
+        self._file.close()
+        self._file = None
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+        os.remove(self.tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class LipRoiMemmap(object):
+    """Preallocated lip ROI file of known shape, filled by slices.
+
+    Meant for writers that produce frames out of order (e.g. parallel chunks
+    of one video): `array` is a writable [T, H, W] uint8 memmap, and the file
+    only appears under its final name once closed.
+    """
+
+    def __init__(self, path, shape):
+        self.path = Path(path)
+        self.tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.part")
+        self.array = np.lib.format.open_memmap(self.tmp_path, mode="w+", dtype=np.uint8, shape=tuple(shape))
+
+    def close(self):
+        if self.array is None:
+            return
+        self.array.flush()
+        self.array = None  # drop the mapping before the rename (required on Windows)
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        if self.array is None:
+            return
+        self.array = None
+        os.remove(self.tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def save_lip_roi(frames, path):
+    """Write an iterable of lip ROI frames to `path`; returns the frame count."""
+    with LipRoiWriter(path) as writer:
+        for frame in frames:
+            writer.write(frame)
+    return writer.num_frames
+
+
+def load_lip_roi(path, mmap=True):
+    """Load a lip ROI file as a [T, H, W] uint8 array (memory-mapped by default)."""
+    return np.load(str(path), mmap_mode="r" if mmap else None)
+
+
+def is_lip_roi_file(path):
+    return str(path).endswith(LIP_ROI_SUFFIX)
+
+
+def lip_movement_key(filename):
+    """Clip base name of a `_lip_movement` output file name, None for other files."""
+    name = os.path.basename(str(filename))
+    suffix = next((suffix for suffix in LIP_MOVEMENT_SUFFIXES if name.endswith(suffix)), None)
+    return None if suffix is None else name[:-len(suffix)]
+
+
+def find_lip_movement_files(directory):
+    """{clip base name: path} of the lip movement outputs in `directory`, one per clip.
+    A clip with both a `.npy` ROI and an `.mp4` preview is listed once, with its `.npy`.
+    """
+    found = {}
+    for name in sorted(os.listdir(directory)):
+        key = lip_movement_key(name)
+        if key is not None and (key not in found or name.endswith(LIP_MOVEMENT_SUFFIXES[0])):
+            found[key] = os.path.join(directory, name)
+    return found
@@ -3,78 +3,173 @@ from python_speech_features import logfbank
 from scipy.io import wavfile
 import torch
 import torch.nn.functional as F
-from .utils import load_video, Compose, Normalize, CenterCrop, load_video
+from .utils import load_video, Compose, Normalize, CenterCrop
+from .noise_mixing import mix_with_bank
+from ..profiling import stage
 
-def load_feature(video_path, audio_path):
+IMAGE_CROP_SIZE = 88
+IMAGE_MEAN = 0.421
+IMAGE_STD = 0.165
+VIDEO_CROP = CenterCrop((IMAGE_CROP_SIZE, IMAGE_CROP_SIZE))
+VIDEO_TRANSFORM = Compose([
+    VIDEO_CROP,
+    Normalize( 0.0,255.0 ),
+    Normalize(IMAGE_MEAN, IMAGE_STD)
+])
+
+def stacker(feats, stack_order):
+    """
+    Concatenating consecutive audio frames
+    Args:
+    feats - numpy.ndarray of shape [T, F]
+    stack_order - int (number of neighboring frames to concatenate
+    Returns:
+    feats - numpy.ndarray of shape [T', F']
+    """
+    feat_dim = feats.shape[1]
+    if len(feats) % stack_order != 0:
+        res = stack_order - len(feats) % stack_order
+        res = np.zeros([res, feat_dim]).astype(feats.dtype)
+        feats = np.concatenate([feats, res], axis=0)
+    feats = feats.reshape((-1, stack_order, feat_dim)).reshape(-1, stack_order*feat_dim)
+    return feats
+
+def load_feature(video_path, audio_path, uint8_video=False):
     """
     Load image and audio feature
     Returns:
-    video_feats: numpy.ndarray of shape [T, H, W, 1], audio_feats: numpy.ndarray of shape [T, F]
+    video_source: tensor of shape [1, C, T, H, W], audio_source: tensor of shape [1, F, T],
+    padding_mask: bool tensor of shape [1, T] (True = padding, none for a single clip)
+    With `uint8_video` the video is the raw uint8 lip ROI, 4x smaller to queue and
+    transfer; the model's video frontend crops and normalizes it (`ResEncoder.prepare_input`).
     """
-    def stacker(feats, stack_order):
-        """
-        Concatenating consecutive audio frames
-        Args:
-        feats - numpy.ndarray of shape [T, F]
-        stack_order - int (number of neighboring frames to concatenate
-        Returns:
-        feats - numpy.ndarray of shape [T', F']
-        """
-        feat_dim = feats.shape[1]
-        if len(feats) % stack_order != 0:
-            res = stack_order - len(feats) % stack_order
-            res = np.zeros([res, feat_dim]).astype(feats.dtype)
-            feats = np.concatenate([feats, res], axis=0)
-        feats = feats.reshape((-1, stack_order, feat_dim)).reshape(-1, stack_order*feat_dim)
-        return feats
     # video_fn, audio_fn = mix_name
     # if 'video' in self.modalities:
-    video_feats = load_video_features(video_path) # [T, H, W, 1]
+    with stage("video_features"):
+        video_feats = load_video(video_path) if uint8_video else load_video_features(video_path) # [T, H, W(, 1)]
     # else:
         # video_feats = None
     # if 'audio' in self.modalities:
     # audio_fn = audio_fn.split(':')[0]
+    with stage("audio_features"):
+        sample_rate, wav_data = wavfile.read(audio_path)
+        audio_feats = load_audio_features(wav_data, sample_rate) # [T/stack_order_audio, F*stack_order_audio]
+    # else:
+    #     audio_feats = None
+    audio_feats = align_audio_features(audio_feats, len(video_feats))
+    return {
+        "video_source": to_uint8_video_source(video_feats) if uint8_video else to_video_source(video_feats),
+        'audio_source': to_audio_source(audio_feats),
+        "padding_mask": no_padding(1, len(video_feats)),
+    }
+
+def load_features(pairs, uint8_video=False):
+    """`load_feature` for several (video_path, audio_path) clips, padded into one batch by `collate_features`."""
+    return collate_features([
+        load_feature(video_path, audio_path, uint8_video=uint8_video) for video_path, audio_path in pairs
+    ])
+
+def collate_features(samples):
+    """
+    Pad single-clip samples (`load_feature` outputs) to the longest clip
+    Returns:
+    video_source: tensor of shape [B, C, T, H, W], audio_source: tensor of shape [B, F, T],
+    padding_mask: bool tensor of shape [B, T] (True = padding), lengths: tensor of shape [B]
+    Padded frames are zero after normalization (for uint8 video the frontend zeroes
+    them), which is what the video frontend's temporal convolution sees past the
+    end of an unpadded clip, and the model takes `attention_mask=~padding_mask`,
+    so every clip decodes as it would alone.
+    """
+    lengths = [sample["audio_source"].size(-1) for sample in samples]
+    max_length = max(lengths)
+    video = samples[0]["video_source"]
+    audio = samples[0]["audio_source"]
+    video_source = video.new_zeros((len(samples), video.size(1), max_length, *video.shape[3:]))
+    audio_source = audio.new_zeros((len(samples), audio.size(1), max_length))
+    padding_mask = torch.ones(len(samples), max_length, dtype=torch.bool)
+    for idx, (sample, length) in enumerate(zip(samples, lengths)):
+        video_source[idx, :, :length] = sample["video_source"][0]
+        audio_source[idx, :, :length] = sample["audio_source"][0]
+        padding_mask[idx, :length] = sample["padding_mask"][0]
+    return {
+        "video_source": video_source,
+        "audio_source": audio_source,
+        "padding_mask": padding_mask,
+        "lengths": torch.tensor(lengths),
+    }
+
+def no_padding(batch_size, length):
+    return torch.zeros(batch_size, length, dtype=torch.bool)
+
+def load_noisy_features(video_path, audio_path, noise_bank, snrs, rng=None, indices=None):
+    """
+    `load_feature` for a noise sweep: the clean audio is mixed in memory with
+    one `noise_bank` slice per SNR (see `mix_with_bank`) and never written to disk
+    Returns:
+    video_source: tensor of shape [1, C, T, H, W] (once for all mixtures),
+    audio_source: tensor of shape [N, F, T] (one row per SNR), padding_mask: bool tensor of shape [N, T],
+    mixtures: int16 array of shape [N, samples]
+    """
+    with stage("video_features"):
+        video_feats = load_video_features(video_path)
     sample_rate, wav_data = wavfile.read(audio_path)
+    with stage("noise_mixing", mixtures=len(np.atleast_1d(snrs))):
+        mixtures = mix_with_bank(wav_data, noise_bank, snrs, rng=rng, indices=indices)
+    with stage("audio_features", mixtures=len(mixtures)):
+        audio_feats = np.stack([
+            align_audio_features(load_audio_features(mixture, sample_rate), len(video_feats))
+            for mixture in mixtures
+        ])
+    return {
+        "video_source": to_video_source(video_feats),
+        "audio_source": to_audio_source(audio_feats),
+        "padding_mask": no_padding(len(mixtures), len(video_feats)),
+        "mixtures": mixtures,
+    }
+
+def load_audio_features(wav_data, sample_rate=16_000):
+    """Stacked log filterbank features [T/4, F*4] of 16 kHz mono samples, from a file or a mixture."""
     assert sample_rate == 16_000 and len(wav_data.shape) == 1
-    
     audio_feats = logfbank(wav_data, samplerate=sample_rate).astype(np.float32) # [T, F]
-    audio_feats = stacker(audio_feats, 4) # [T/stack_order_audio, F*stack_order_audio]
-    # else:
-    #     audio_feats = None
-    if audio_feats is not None and video_feats is not None:
-        diff = len(audio_feats) - len(video_feats)
-        if diff < 0:
-            audio_feats = np.concatenate([audio_feats, np.zeros([-diff, audio_feats.shape[-1]], dtype=audio_feats.dtype)])
-        elif diff > 0:
-            audio_feats = audio_feats[:-diff]
+    return stacker(audio_feats, 4) # [T/stack_order_audio, F*stack_order_audio]
 
+def align_audio_features(audio_feats, num_video_frames):
+    """Zero-pad or cut audio features to the number of video frames."""
+    diff = len(audio_feats) - num_video_frames
+    if diff < 0:
+        audio_feats = np.concatenate([audio_feats, np.zeros([-diff, audio_feats.shape[-1]], dtype=audio_feats.dtype)])
+    elif diff > 0:
+        audio_feats = audio_feats[:-diff]
+    return audio_feats
 
-    audio_feats, video_feats = torch.from_numpy(audio_feats.astype(np.float32)) if audio_feats is not None else None, torch.from_numpy(video_feats.astype(np.float32)) if video_feats is not None else None
+def to_audio_source(audio_feats):
+    """[T, F] or [N, T, F] audio features -> layer-normed model input of shape [N, F, T]."""
+    audio_feats = torch.from_numpy(audio_feats.astype(np.float32))
+    if audio_feats.dim() == 2:
+        audio_feats = audio_feats.unsqueeze(0)
     # if self.normalize and 'audio' in self.modalities:
     with torch.no_grad():
+        # normalized over each clip's whole [T, F] matrix
         audio_feats = F.layer_norm(audio_feats, audio_feats.shape[1:])
+    return audio_feats.permute(0, 2, 1)
 
-    # audio_feats shape [batch, F, T]
-    audio_feats = audio_feats.permute(1, 0).unsqueeze(0)
-
-    # video_feats shape [batch, C, T, H, W]
-    video_feats = video_feats.permute(3, 0, 1, 2).unsqueeze(0)
+def to_video_source(video_feats):
+    """[T, H, W, C] video features -> model input of shape [1, C, T, H, W]."""
+    return torch.from_numpy(video_feats.astype(np.float32, copy=False)).permute(3, 0, 1, 2).unsqueeze(0)
 
-    return {"video_source": video_feats, 'audio_source': audio_feats}
+def to_uint8_video_source(frames):
+    """(T, H, W) uint8 gray frames -> center-cropped uint8 model input of shape [1, 1, T, 88, 88].
+    Cropped on the host like the float features, so clips of any frame size collate together.
+    """
+    return torch.from_numpy(np.array(VIDEO_CROP(frames), dtype=np.uint8))[None, None]
 
 def load_video_features(video_path):
+    return video_features_from_frames(load_video(video_path))
 
-    image_crop_size = 88
-    image_mean = 0.421
-    image_std = 0.165
-    transform = Compose([
-        Normalize( 0.0,255.0 ),
-        CenterCrop((image_crop_size, image_crop_size)),
-        Normalize(image_mean, image_std) 
-    ])
-
-    feats = load_video(video_path)
-    feats = transform(feats)
+def video_features_from_frames(frames):
+    """Center-cropped, normalized [T, 88, 88, 1] float32 features of (T, H, W) uint8 gray frames."""
+    # one fused pass: crop view of the uint8 frames, both normalizations looked up per pixel value
+    feats = VIDEO_TRANSFORM(frames)
     feats = np.expand_dims(feats, axis=-1)
     return feats
 
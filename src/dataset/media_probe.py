@@ -0,0 +1,113 @@
+import os
+import json
+import asyncio
+import threading
+import subprocess
+
+PROBE_COMMAND = ["ffprobe", "-v", "error", "-show_format", "-show_streams", "-of", "json"]
+
+_PROBES = {}
+_PROBES_LOCK = threading.Lock()
+
+
+def _probe_key(path):
+    stat = os.stat(path)
+    return os.path.abspath(path), stat.st_mtime_ns, stat.st_size
+
+
+def _parse_probe(path, returncode, stdout, stderr):
+    output = stdout.decode().strip()
+    if returncode != 0 or not output:
+        print(f"❌ ffprobe failed for {path}")
+        print("⚠️ ffprobe stderr:", stderr.decode())
+        raise ValueError(f"ffprobe failed for {path}")
+    return json.loads(output)
+
+
+def _remember(key, info):
+    with _PROBES_LOCK:
+        _PROBES[key] = info
+    return info
+
+
+def probe_media(path):
+    """ffprobe format/streams info of `path`, cached per (path, mtime, size)."""
+    key = _probe_key(path)
+    with _PROBES_LOCK:
+        if key in _PROBES:
+            return _PROBES[key]
+    result = subprocess.run(PROBE_COMMAND + [str(path)], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    return _remember(key, _parse_probe(path, result.returncode, result.stdout, result.stderr))
+
+
+async def probe_media_async(path, semaphore=None):
+    """Async `probe_media`; `semaphore` bounds the number of ffprobe processes."""
+    key = _probe_key(path)
+    with _PROBES_LOCK:
+        if key in _PROBES:
+            return _PROBES[key]
+    async with semaphore or _NullSemaphore():
+        stdout, stderr, returncode = await _communicate(PROBE_COMMAND + [str(path)])
+    return _remember(key, _parse_probe(path, returncode, stdout, stderr))
+
+
+def prefetch_probes(paths, max_concurrency=16):
+    """Probe many files concurrently (ffprobe startup overlaps) and fill the cache.
+    Returns {path: info}, with the exception instead of the info for failed files.
+    """
+    async def probe_all():
+        semaphore = asyncio.Semaphore(max_concurrency)
+        results = await asyncio.gather(
+            *(probe_media_async(path, semaphore) for path in paths), return_exceptions=True
+        )
+        return dict(zip(paths, results))
+
+    return asyncio.run(probe_all())
+
+
+def video_stream(info):
+    """The first video stream of a `probe_media` result."""
+    for stream in info.get("streams", []):
+        if stream.get("codec_type") == "video":
+            return stream
+    raise ValueError("No video streams found")
+
+
+def load_probe_cache(path):
+    """Merge probes saved by `save_probe_cache`; entries of changed files are never hit."""
+    if not os.path.exists(path):
+        return 0
+    with open(path) as f:
+        entries = json.load(f)
+    with _PROBES_LOCK:
+        for entry in entries:
+            _PROBES[(entry["path"], entry["mtime_ns"], entry["size"])] = entry["info"]
+    return len(entries)
+
+
+def save_probe_cache(path):
+    with _PROBES_LOCK:
+        entries = [
+            {"path": key[0], "mtime_ns": key[1], "size": key[2], "info": info}
+            for key, info in _PROBES.items()
+        ]
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(entries, f)
+    os.replace(tmp_path, path)
+
+
+class _NullSemaphore(object):
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+async def _communicate(command):
+    process = await asyncio.create_subprocess_exec(
+        *command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+    )
+    stdout, stderr = await process.communicate()
+    return stdout, stderr, process.returncode
@@ -0,0 +1,74 @@
+import numpy as np
+from scipy.io import wavfile
+
+INT16_MAX = np.iinfo(np.int16).max
+INT16_MIN = np.iinfo(np.int16).min
+
+
+class NoiseBank(object):
+    """Noise WAVs loaded once as memory maps, sliced at random offsets.
+
+    Only the samples a mixture needs are paged in, so large noise corpora cost
+    no RAM up front and no disk reads per mixture beyond the slice itself.
+    """
+
+    def __init__(self, noise_files, sample_rate=16_000):
+        self.files = [str(path) for path in noise_files]
+        self.noises = []
+        for path in self.files:
+            sr, noise = wavfile.read(path, mmap=True)
+            assert sr == sample_rate, f"{path}: expected {sample_rate} Hz, got {sr} Hz"
+            self.noises.append(noise if noise.ndim == 1 else noise[:, 0])
+
+    def __len__(self):
+        return len(self.noises)
+
+    def slice(self, index, length, offset=0):
+        """`length` samples of noise `index` from `offset`, repeated when the noise is shorter."""
+        noise = self.noises[index]
+        if len(noise) < length:
+            return np.resize(np.asarray(noise), length)
+        offset = min(offset, len(noise) - length)
+        return np.asarray(noise[offset:offset + length])
+
+    def sample(self, num, length, rng=None, indices=None):
+        """(num, length) float32 noise slices at random offsets, of random noises unless `indices` is given."""
+        rng = rng if rng is not None else np.random.default_rng()
+        if indices is None:
+            indices = rng.integers(len(self.noises), size=num)
+        batch = np.empty((num, length), dtype=np.float32)
+        for row, index in enumerate(indices):
+            max_offset = max(len(self.noises[index]) - length, 0)
+            batch[row] = self.slice(index, length, int(rng.integers(max_offset + 1)))
+        return batch
+
+
+def mix_noise_batch(signal, noises, snrs):
+    """Mix one clean signal with every row of `noises` at the matching SNR (dB).
+
+    signal: (L,) int16 samples, noises: (N, L), snrs: (N,) or a scalar.
+    Returns the (N, L) int16 mixtures; like `add_noise`, a mixture that would
+    clip is scaled down as a whole rather than clipped.
+    """
+    signal = np.asarray(signal, dtype=np.float32)
+    noises = np.asarray(noises, dtype=np.float32)
+    snrs = np.broadcast_to(np.asarray(snrs, dtype=np.float32), (len(noises),))
+
+    amp_s = np.sqrt(np.mean(np.square(signal)))
+    amp_n = np.sqrt(np.mean(np.square(noises), axis=-1, keepdims=True))
+    amp_n = np.maximum(amp_n, np.finfo(np.float32).tiny)  # silent noise stays silent instead of NaN
+    mixed = signal[None] + noises * (amp_s / amp_n) / (10 ** (snrs[:, None] / 20))
+
+    # Avoid clipping noise
+    peak, trough = mixed.max(axis=-1), mixed.min(axis=-1)
+    reduction_rate = np.where(peak >= np.abs(trough), INT16_MAX / np.maximum(peak, 1), INT16_MIN / np.minimum(trough, -1))
+    clipping = (peak > INT16_MAX) | (trough < INT16_MIN)
+    mixed *= np.where(clipping, reduction_rate, 1.0).astype(np.float32)[:, None]
+    return mixed.astype(np.int16)
+
+
+def mix_with_bank(signal, noise_bank, snrs, rng=None, indices=None):
+    """One mixture per SNR, each with a random slice of the bank; (len(snrs), L) int16."""
+    snrs = np.atleast_1d(snrs)
+    noises = noise_bank.sample(len(snrs), len(signal), rng=rng, indices=indices)
+    return mix_noise_batch(signal, noises, snrs)
@@ -0,0 +1,137 @@
+import time
+import queue
+import threading
+import torch
+from collections import deque
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+
+from .load_data import load_feature, collate_features
+from .feature_store import FeatureStore
+from ..profiling import stage, get_profiler
+
+_STORES = {}  # feature stores opened by this (worker) process
+_DONE = object()
+
+
+def load_batch(clips, store_root=None, uint8_video=False):
+    """Load and collate (key, video_path, audio_path) clips; keys present in the
+    feature store at `store_root` are read from it instead of being decoded.
+    `uint8_video` is passed on to `load_feature`.
+    Returns the loaded keys, the `collate_features` batch (None if nothing
+    loaded) and {key: error} for the clips that failed.
+    """
+    store = None
+    if store_root is not None:
+        if store_root not in _STORES:
+            _STORES[store_root] = FeatureStore(store_root)
+        store = _STORES[store_root]
+    keys, samples, failed = [], [], {}
+    for key, video_path, audio_path in clips:
+        try:
+            if store is not None and key in store:
+                samples.append(store.load_feature(key, uint8_video=uint8_video))
+            else:
+                samples.append(load_feature(video_path, audio_path, uint8_video=uint8_video))
+            keys.append(key)
+        except Exception as e:
+            failed[key] = str(e)
+    return keys, collate_features(samples) if samples else None, failed
+
+
+def _time_load(submitted, future):
+    # runs in this process when a load finishes, whichever order results are consumed in
+    profiler = get_profiler()
+    if profiler is not None:
+        profiler.add("prefetch_load", submitted, time.perf_counter() - submitted)
+
+
+def pin_sample(sample):
+    """Page-lock the tensors of a sample so `.cuda(non_blocking=True)` copies overlap compute."""
+    if not torch.cuda.is_available():
+        return sample
+    if isinstance(sample, torch.Tensor):
+        return sample.pin_memory()
+    if isinstance(sample, dict):
+        return {key: pin_sample(value) for key, value in sample.items()}
+    if isinstance(sample, (tuple, list)):
+        return type(sample)(pin_sample(value) for value in sample)
+    return sample
+
+
+class Prefetcher(object):
+    """Runs `load_fn(*item)` for upcoming items in a process pool while the caller consumes earlier ones.
+
+    Iterating yields (item, result, error) in input order. At most `depth`
+    items are loading, being pinned or ready but unconsumed: a new one is only
+    submitted when the consumer takes one, so memory stays bounded however slow
+    the consumer is. Results are pinned (`pin_memory`) by a background thread
+    in this process, since pinned pages can't be handed over from the workers,
+    so the consumer takes batches that are already page-locked (like
+    DataLoader's pin_memory thread). `wait_seconds` is how long the consumer
+    sat waiting for input; near zero means the loaders keep up. Stages timed
+    inside `load_fn` stay in the workers, so each load is timed here instead, from
+    submission to result, as `prefetch_load`.
+    """
+
+    def __init__(self, load_fn, items, num_workers=4, depth=8, pin_memory=True):
+        self.load_fn = load_fn
+        self.items = iter(items)
+        self.depth = max(depth, 1)
+        self.pin_memory = pin_memory
+        self.wait_seconds = 0.0
+        self._executor = ProcessPoolExecutor(max_workers=num_workers)
+        self._futures = deque()  # submitted, in input order, until consumed
+        self._submitted = queue.Queue()  # (item, future) for the pin thread, _DONE to stop it
+        self._ready = queue.Queue()  # (item, result, error), pinned
+        self._pin_thread = threading.Thread(target=self._pin_loop, name="prefetch-pin", daemon=True)
+        self._pin_thread.start()
+
+    def _pin_loop(self):
+        while True:
+            entry = self._submitted.get()
+            if entry is _DONE:
+                return
+            item, future = entry
+            try:
+                result, error = future.result(), None
+                if self.pin_memory:
+                    result = pin_sample(result)
+            except Exception as e:
+                result, error = None, e
+            self._ready.put((item, result, error))
+
+    def _fill(self):
+        while len(self._futures) < self.depth:
+            item = next(self.items, _DONE)
+            if item is _DONE:
+                return
+            future = self._executor.submit(self.load_fn, *item)
+            future.add_done_callback(partial(_time_load, time.perf_counter()))
+            self._futures.append(future)
+            self._submitted.put((item, future))
+
+    def __iter__(self):
+        self._fill()
+        while self._futures:
+            start = time.perf_counter()
+            with stage("input_wait"):
+                item, result, error = self._ready.get()
+            self.wait_seconds += time.perf_counter() - start
+            self._futures.popleft()
+            self._fill()
+            yield item, result, error
+
+    def close(self):
+        for future in self._futures:
+            future.cancel()
+        self._futures.clear()
+        self._submitted.put(_DONE)
+        self._pin_thread.join()
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,107 @@
+import os
+import atexit
+import shutil
+import hashlib
+import tempfile
+import threading
+from pathlib import Path
+from collections import OrderedDict
+
+SCRATCH_ENV = "AVSR_SCRATCH_DIR"  # overrides the scratch location, e.g. a fast local disk
+SCRATCH_BUDGET = 2 << 30  # bytes of intermediates kept before the least recently used are evicted
+
+_DEFAULT_SCRATCH = None
+_DEFAULT_SCRATCH_LOCK = threading.Lock()
+
+
+def default_scratch_root():
+    """$AVSR_SCRATCH_DIR, else /dev/shm (tmpfs) where available, else the system temp dir."""
+    if os.environ.get(SCRATCH_ENV):
+        return Path(os.environ[SCRATCH_ENV])
+    if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK):
+        return Path("/dev/shm") / "avsr_scratch"
+    return Path(tempfile.gettempdir()) / "avsr_scratch"
+
+
+def remove_stale_scratch(base):
+    """Delete scratch dirs left behind by processes that died without cleaning up (POSIX only)."""
+    if os.name != "posix" or not base.is_dir():
+        return
+    for path in base.glob("pid*"):
+        try:
+            os.kill(int(path.name[3:]), 0)
+        except ProcessLookupError:
+            shutil.rmtree(path, ignore_errors=True)
+        except (ValueError, PermissionError):
+            pass  # not ours, or the process is alive under another user
+
+
+class ScratchSpace(object):
+    """Workspace for intermediate media files.
+
+    Files get deterministic names derived from what they are made from, so a
+    rerun reuses (and overwrites) the same path instead of piling up
+    timestamped copies. Registered files count against `budget_bytes`; once
+    over it, the least recently used ones are deleted. The process's own
+    directory is removed on exit.
+    """
+
+    def __init__(self, root=None, budget_bytes=SCRATCH_BUDGET):
+        base = Path(root or default_scratch_root())
+        remove_stale_scratch(base)
+        self.root = base / f"pid{os.getpid()}"
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.budget_bytes = budget_bytes
+        self._files = OrderedDict()  # path -> size, least recently used first
+        self._lock = threading.Lock()
+
+    def path(self, source, tag, suffix=".mp4"):
+        """Deterministic scratch path for the `tag` intermediate of `source`."""
+        source = Path(source)
+        digest = hashlib.sha1(str(source.resolve()).encode("utf-8")).hexdigest()[:12]
+        path = self.root / f"{source.stem}_{digest}_{tag}{suffix}"
+        with self._lock:
+            if path in self._files:
+                self._files.move_to_end(path)
+        return path
+
+    def register(self, path):
+        """Account a written file and evict least recently used files beyond the budget."""
+        path = Path(path)
+        size = path.stat().st_size if path.exists() else 0
+        with self._lock:
+            self._files[path] = size
+            self._files.move_to_end(path)
+            used = sum(self._files.values())
+            for old_path in list(self._files):
+                if used <= self.budget_bytes or old_path == path:
+                    break
+                used -= self._files.pop(old_path)
+                old_path.unlink(missing_ok=True)
+        return path
+
+    @property
+    def used_bytes(self):
+        with self._lock:
+            return sum(self._files.values())
+
+    def cleanup(self):
+        with self._lock:
+            self._files.clear()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cleanup()
+
+
+def get_scratch():
+    """Return the process-wide scratch space, creating it on first use."""
+    global _DEFAULT_SCRATCH
+    with _DEFAULT_SCRATCH_LOCK:
+        if _DEFAULT_SCRATCH is None:
+            _DEFAULT_SCRATCH = ScratchSpace()
+            atexit.register(_DEFAULT_SCRATCH.cleanup)
+        return _DEFAULT_SCRATCH
@@ -0,0 +1,54 @@
+import re
+import threading
+from pathlib import Path
+from collections import OrderedDict
+
+GLIPS_CLIP_RE = re.compile(r"_(\d+)-\d+$")  # <word>_<session>-<clip>, e.g. aber_0140-0056
+
+
+def glips_session_id(path):
+    """Source session of a GLips clip ("0140" for aber_0140-0056.mp4), or None for other names."""
+    match = GLIPS_CLIP_RE.search(Path(path).stem)
+    return match.group(1) if match else None
+
+
+def interleave_sessions(files):
+    """Order clips round-robin over their sessions.
+
+    Every session's first clip comes before any session's second clip, so by
+    the time a clip starts, an earlier clip of its session has usually finished
+    and can seed it. Clips without a session id each count as their own session.
+    """
+    sessions = OrderedDict()
+    for file in sorted(files):
+        sessions.setdefault(glips_session_id(file) or file, []).append(file)
+    rounds = max((len(clips) for clips in sessions.values()), default=0)
+    return [clips[idx] for idx in range(rounds) for clips in sessions.values() if idx < len(clips)]
+
+
+class SessionFaceSeeds(object):
+    """Latest face box per GLips session, shared by the threads of a batch run.
+
+    Clips of one broadcast session have nearly the same framing, so the box of
+    an earlier clip seeds track mode for the next one (`face_seed`), which then
+    skips its cold-start detection unless the seed doesn't fit.
+    """
+
+    def __init__(self):
+        self._rects = {}
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        session = glips_session_id(path)
+        with self._lock:
+            return self._rects.get(session) if session else None
+
+    def update(self, path, rect):
+        session = glips_session_id(path)
+        if session is None or rect is None:
+            return
+        with self._lock:
+            self._rects[session] = tuple(rect)
+
+    def __len__(self):
+        return len(self._rects)
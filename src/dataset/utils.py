@@ -3,40 +3,92 @@ import torch
 import random
 import numpy as np
 from typing import Dict, List, Optional, Tuple
+from .lip_roi import is_lip_roi_file, load_lip_roi
 
 def load_video(path):
+    if is_lip_roi_file(path):
+        # lossless uint8 gray ROI written by the preprocessing, no decoding needed
+        return load_lip_roi(path)
     for i in range(3):
         try:
             cap = cv2.VideoCapture(path)
-            frames = []
-            while True:
-                ret, frame = cap.read()
-                if ret:
-                    frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-                    frames.append(frame)
-                else:
-                    break
-            frames = np.stack(frames)
-            return frames
+            try:
+                return read_gray_frames(cap)
+            finally:
+                cap.release()
         except Exception:
             print(f"failed loading {path} ({i} / 3)")
             if i == 2:
                 raise ValueError(f"Unable to load {path}")
 
+def read_gray_frames(cap):
+    """Decode all frames of an opened `cv2.VideoCapture` as a (T, H, W) uint8 gray array.
+    Frames are converted straight into one buffer sized from the container's
+    frame count (grown if the count is short), and the bgr frame buffer is reused.
+    """
+    num_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    width, height = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    frames = np.empty((max(num_frames, 1), height, width), dtype=np.uint8)
+    frame, idx = None, 0
+    while True:
+        ret, frame = cap.read(frame)
+        if not ret:
+            break
+        if idx == 0 and frames.shape[1:] != frame.shape[:2]:
+            frames = np.empty((len(frames), *frame.shape[:2]), dtype=np.uint8)  # size not reported
+        if idx == len(frames):
+            frames = np.concatenate([frames, np.empty_like(frames)])
+        cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=frames[idx])
+        idx += 1
+    if idx == 0:
+        raise ValueError("no frames decoded")
+    return frames[:idx]
+
 
 class Compose(object):
     """Compose several preprocess together.
     Args:
         preprocess (list of ``Preprocess`` objects): list of preprocess to compose.
+
+    A chain of only crops, flips and scalar `Normalize`s on a (T, H, W) ndarray
+    runs fused: the geometric steps (which commute with per-pixel affine ones)
+    are applied first as views, the `Normalize`s are folded into one scale and
+    shift, and the float32 output is written once. For uint8 frames that pass is
+    a `cv2.LUT` lookup in a 256-entry table of the chain's float32 result per
+    pixel value, so the output equals running the steps one by one in float32.
     """
 
     def __init__(self, preprocess):
         self.preprocess = preprocess
+        self.geometric = [t for t in preprocess if isinstance(t, GEOMETRIC_PREPROCESS)]
+        self.affine = [t for t in preprocess if isinstance(t, Normalize)]
+        self.fusable = len(self.affine) > 0 and len(self.geometric) + len(self.affine) == len(preprocess) \
+            and all(np.ndim(t.mean) == 0 and np.ndim(t.std) == 0 for t in self.affine)
+        if self.fusable:
+            self.scale, self.shift = 1.0, 0.0
+            for t in self.affine:  # (x * scale + shift - mean) / std
+                self.scale, self.shift = self.scale / t.std, (self.shift - t.mean) / t.std
+            lut = np.arange(256, dtype=np.float32)
+            for t in self.affine:
+                lut = t(lut)
+            self.lut = lut.astype(np.float32, copy=False)
 
     def __call__(self, sample):
-        for t in self.preprocess:
-            sample = t(sample)
-        return sample
+        if not (self.fusable and isinstance(sample, np.ndarray) and sample.ndim == 3):
+            for t in self.preprocess:
+                sample = t(sample)
+            return sample
+        for t in self.geometric:
+            sample = t.view(sample)
+        out = np.empty(sample.shape, dtype=np.float32)
+        if sample.dtype == np.uint8:
+            # the (crop/flip) view is gathered into a small uint8 copy, then looked up in one call
+            sample = np.ascontiguousarray(sample)
+            cv2.LUT(sample.reshape(-1, sample.shape[-1]), self.lut, dst=out.reshape(-1, out.shape[-1]))
+        else:
+            np.multiply(sample, self.scale, out=out, casting='unsafe')
+            out += self.shift
+        return out
 
     def __repr__(self):
         format_string = self.__class__.__name__ + '('
@@ -81,6 +133,10 @@ class CenterCrop(object):
         Returns:
             numpy.ndarray: Cropped image.
         """
+        return self.view(frames)
+
+    def view(self, frames):
+        """The crop as a view of `frames`, nothing is copied."""
         t, h, w = frames.shape
         th, tw = self.size
         delta_w = int(round((w - tw))/2.)
@@ -88,6 +144,9 @@ class CenterCrop(object):
         frames = frames[:, delta_h:delta_h+th, delta_w:delta_w+tw]
         return frames
 
+    def __repr__(self):
+        return self.__class__.__name__ + '(size={0})'.format(self.size)
+
 
 class RandomCrop(object):
     """Crop the given image at the center
@@ -103,6 +162,10 @@ class RandomCrop(object):
         Returns:
             numpy.ndarray: Cropped image.
         """
+        return self.view(frames)
+
+    def view(self, frames):
+        """A random crop as a view of `frames`, nothing is copied."""
         t, h, w = frames.shape
         th, tw = self.size
         delta_w = random.randint(0, w-tw)
@@ -125,14 +188,22 @@ class HorizontalFlip(object):
         Args:
             img (numpy.ndarray): Images to be flipped with a probability flip_ratio
         Returns:
-            numpy.ndarray: Cropped image.
+            numpy.ndarray: Flipped image.
         """
-        t, h, w = frames.shape
+        # one copy of all frames at once instead of a cv2.flip per frame
+        return np.ascontiguousarray(self.view(frames))
+
+    def view(self, frames):
+        """`frames` mirrored along the width (with probability flip_ratio) as a view."""
         if random.random() < self.flip_ratio:
-            for index in range(t):
-                frames[index] = cv2.flip(frames[index], 1)
+            return frames[:, :, ::-1]
         return frames
 
+    def __repr__(self):
+        return self.__class__.__name__ + '(flip_ratio={0})'.format(self.flip_ratio)
+
+GEOMETRIC_PREPROCESS = (CenterCrop, RandomCrop, HorizontalFlip)
+
 def compute_mask_indices(
     shape: Tuple[int, int],
     padding_mask: Optional[torch.Tensor],
@@ -2,25 +2,42 @@ import os
 from ffmpy import FFmpeg
 import cv2
 import subprocess
-import json
 import logging
 from pathlib import Path
 import ffmpeg
 import dlib
 import numpy as np
-from collections import deque
-from tqdm import tqdm
-from skimage import transform
 from scipy.io import wavfile
 import warnings
 import time
-from tqdm.contrib.concurrent import process_map
+import itertools
+import threading
 from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+
+from .face_detectors import get_face_detector, get_model_dir
+from .landmark_pool import get_landmark_pool
+from .landmark_cache import empty_landmarks
+from .lip_roi import LipRoiWriter, LipRoiMemmap, load_lip_roi
+from .media_probe import probe_media, video_stream
+from .noise_mixing import mix_noise_batch
+from .scratch import get_scratch
+from ..profiling import stage
 
 # logger = logging.getLogger(__name__)
 
 # VIDEOS_CACHE = {}
 MAX_MISSING_FRAMES_RATIO = 0.75 #max video frames that is ok to be missing
+TRACK_REDETECT_INTERVAL = 25 #frames between keyframe detections in "track" landmark mode
+DETECTOR_BOX_RELATION = (1.1, 1.1, 0.0, -0.1) #detector box vs its landmark box (width, height scale, x, y shift); "track" mode re-measures it on every keyframe
+ADAPTIVE_SKIP_INTERVAL = 3 #"adaptive" landmark mode computes at least every 3rd frame
+ADAPTIVE_TASK_SKIPS = 8 #"adaptive" landmark pool tasks span 8 skip intervals, see `landmark_chunk_size`
+ADAPTIVE_MOTION_THRESHOLD = 6.0 #mean abs gray-level change of the mouth region that forces a fresh detection
+CHUNK_FRAMES = 1500 #frames per chunk (1 minute at 25 fps) in `extract_lip_movement_chunked`
+FFMPEG_THREADS = None #threads per ffmpeg decode/encode (None = ffmpeg's default, one per core); set by `CpuBudget`
+
+def ffmpeg_thread_args():
+    return {} if FFMPEG_THREADS is None else {"threads": FFMPEG_THREADS}
 
 def resize_frames(input_frames, new_size=(640, 480)):
     resized_frames = []
@@ -32,23 +49,28 @@ def resize_frames(input_frames, new_size=(640, 480)):
     return resized_frames
 
 def save_video(frames, out_filepath, fps, vcodec="libx264"):
-    if len(frames) == 0:
+    # frames may be a list or a lazy iterator (streaming pipeline)
+    frames = iter(frames)
+    first_frame = next(frames, None)
+    if first_frame is None:
         warnings.warn(f"Video segment `{out_filepath.stem}` has no metadata... skipping!!")
         return
 
-    height, width, _ = frames[0].shape
+    height, width = first_frame.shape[:2]
+    # mouth patches are gray; the resize fallback still produces bgr frames
+    in_pix_fmt, out_pix_fmt = ("gray", "yuv420p") if first_frame.ndim == 2 else ("bgr24", "bgr24")
     try:
         process = (
             ffmpeg.input(
-                "pipe:", format="rawvideo", pix_fmt="bgr24", s="{}x{}".format(width, height)
+                "pipe:", format="rawvideo", pix_fmt=in_pix_fmt, s="{}x{}".format(width, height)
             )
-            .output(str(out_filepath), pix_fmt="bgr24", vcodec=vcodec, r=fps)
+            .output(str(out_filepath), pix_fmt=out_pix_fmt, vcodec=vcodec, r=fps, **ffmpeg_thread_args())
             .overwrite_output()
             .run_async(pipe_stdin=True, pipe_stderr=True, quiet=True)
         )
         print(f"🎥 Writing video to: {out_filepath}")
 
-        for frame in frames:
+        for frame in itertools.chain([first_frame], frames):
             try:
                 process.stdin.write(frame.astype(np.uint8).tobytes())
             except Exception as e:
@@ -73,50 +95,85 @@ def save_video(frames, out_filepath, fps, vcodec="libx264"):
 
 
 
-def apply_transform(trans, img, std_size):
-    warped = transform.warp(img, inverse_map=trans.inverse, output_shape=std_size)
-    warped = warped * 255  # note output from warp is double image (value range [0,1])
-    warped = warped.astype("uint8")
-    return warped
-
-def cut_patch(img, metadata, height, width, threshold=5):
-    center_x, center_y = np.mean(metadata, axis=0)
-    if center_y - height < 0:
-        center_y = height
-    if center_y - height < 0 - threshold:
-        raise Exception("too much bias in height")
-    if center_x - width < 0:
-        center_x = width
-    if center_x - width < 0 - threshold:
-        raise Exception("too much bias in width")
-
-    if center_y + height > img.shape[0]:
-        center_y = img.shape[0] - height
-    if center_y + height > img.shape[0] + threshold:
-        raise Exception("too much bias in height")
-    if center_x + width > img.shape[1]:
-        center_x = img.shape[1] - width
-    if center_x + width > img.shape[1] + threshold:
-        raise Exception("too much bias in width")
-
-    cutted_img = np.copy(
-        img[
-            int(round(center_y) - round(height)) : int(round(center_y) + round(height)),
-            int(round(center_x) - round(width)) : int(round(center_x) + round(width)),
-        ]
+STABLE_POINTS_IDS = [33, 36, 39, 42, 45]
+LANDMARK_FIXED_POINT = 1024 #smoothing sums run on landmarks in 1/1024 px integer units, so every window mean is exact
+
+def estimate_similarity_transforms(src, dst):
+    """Closed-form least-squares similarity transforms for a batch of point sets.
+    src: (N, K, 2) points, dst: (K, 2) points.
+    Returns (N, 2, 3) affine matrices mapping each src set onto dst (the same
+    solution as skimage's "similarity" `estimate_transform`).
+    """
+    src = np.asarray(src, dtype=np.float64)
+    dst = np.asarray(dst, dtype=np.float64)
+    src_mean = src.mean(axis=1)
+    dst_mean = dst.mean(axis=0)
+    src_demean = src - src_mean[:, None]
+    dst_demean = dst - dst_mean
+    norm = (src_demean ** 2).sum(axis=(1, 2))
+    a = (src_demean * dst_demean).sum(axis=(1, 2)) / norm
+    b = (src_demean[..., 0] * dst_demean[:, 1] - src_demean[..., 1] * dst_demean[:, 0]).sum(axis=1) / norm
+    transforms = np.empty((len(src), 2, 3))
+    transforms[:, 0, 0], transforms[:, 0, 1] = a, -b
+    transforms[:, 1, 0], transforms[:, 1, 1] = b, a
+    transforms[:, :, 2] = dst_mean - np.einsum("nij,nj->ni", transforms[:, :, :2], src_mean)
+    return transforms
+
+def apply_transforms(transforms, points):
+    """Apply (N, 2, 3) affine matrices to (N, K, 2) points."""
+    return np.einsum("nij,nkj->nki", transforms[:, :, :2], points) + transforms[:, None, :, 2]
+
+def smooth_landmarks(landmarks, margin):
+    """Forward moving average over `margin` frames: window i averages frames i..i+margin-1.
+    Uses a running (integer) sum, returns the T - margin + 1 full windows.
+    """
+    fixed = np.rint(np.asarray(landmarks, dtype=np.float64) * LANDMARK_FIXED_POINT).astype(np.int64)
+    running_sum = np.concatenate([np.zeros_like(fixed[:1]), np.cumsum(fixed, axis=0)])
+    return (running_sum[margin:] - running_sum[:-margin]) / float(margin * LANDMARK_FIXED_POINT)
+
+def compute_roi_transforms(
+    landmarks,
+    mean_face_metadata,
+    std_size=(256, 256),
+    window_margin=12,
+    start_idx=48,
+    stop_idx=68,
+    crop_height=96,
+    crop_width=96,
+):
+    """Affine matrices mapping every source frame straight onto its mouth patch.
+
+    Same geometry as the former per-frame pipeline: align the stable points of
+    the landmarks smoothed over `window_margin` frames to the mean face (the
+    last frames reuse the final window's transform), then cut a
+    crop_height x crop_width patch around the mouth inside the `std_size`
+    aligned face. Here the alignment and the cut are folded into one (T, 2, 3)
+    matrix per frame.
+    """
+    landmarks = np.asarray(landmarks, dtype=np.float64)
+    num_frames = len(landmarks)
+    margin = min(num_frames, window_margin)
+    smoothed = smooth_landmarks(landmarks[:, STABLE_POINTS_IDS], margin)
+    transforms = estimate_similarity_transforms(
+        smoothed, mean_face_metadata[STABLE_POINTS_IDS, :]
+    )
+    transforms = transforms[np.minimum(np.arange(num_frames), num_frames - margin)]
+    # -- mouth centre in the aligned face, kept inside the std_size image (the old `cut_patch`
+    # clamped the same way; its "too much bias" checks ran after the clamp and never fired)
+    center = apply_transforms(transforms, landmarks[:, start_idx:stop_idx]).mean(axis=1)
+    half_size = np.array([crop_width // 2, crop_height // 2])
+    center = np.clip(center, half_size, np.array([std_size[1], std_size[0]]) - half_size)
+    # -- shift so the patch's top-left corner lands on the origin
+    transforms[:, :, 2] -= np.round(center) - half_size
+    return transforms
+
+def warp_roi(frame, transform, crop_height=96, crop_width=96):
+    """Warp one bgr (or gray) frame directly into its uint8 gray mouth patch."""
+    gray = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    return cv2.warpAffine(
+        gray, transform, (crop_width, crop_height),
+        flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT, borderValue=0,
     )
-    return cutted_img
-
-def warp_img(src, dst, img, std_size):
-    tform = transform.estimate_transform(
-        "similarity", src, dst
-    )  # find the transformation matrix
-    warped = transform.warp(
-        img, inverse_map=tform.inverse, output_shape=std_size
-    )  # warp
-    warped = warped * 255  # note output from wrap is double image (value range [0,1])
-    warped = warped.astype("uint8")
-    return warped, tform
 
 def crop_patch(
     video_frames,
@@ -130,247 +187,662 @@ def crop_patch(
     crop_height=96,
     crop_width=96,
 ):
-    """Crop mouth patch"""
-    stablePntsIDs = [33, 36, 39, 42, 45]
-    margin = min(num_frames, window_margin)
-    q_frame, q_metadata = deque(), deque()
-    sequence = []
-    for frame_idx, frame in enumerate(video_frames):
-        if frame_idx >= len(metadata):
-            break  #! Sadly, this is necessary
-        q_metadata.append(metadata[frame_idx])
-        q_frame.append(frame)
-        if len(q_frame) == margin:
-            smoothed_metadata = np.mean(q_metadata, axis=0)
-            cur_metadata = q_metadata.popleft()
-            cur_frame = q_frame.popleft()
-            # -- affine transformation
-            trans_frame, trans = warp_img(
-                smoothed_metadata[stablePntsIDs, :],
-                mean_face_metadata[stablePntsIDs, :],
-                cur_frame,
-                std_size,
-            )
-            trans_metadata = trans(cur_metadata)
-            # -- crop mouth patch
-            sequence.append(
-                cut_patch(
-                    trans_frame,
-                    trans_metadata[start_idx:stop_idx],
-                    crop_height // 2,
-                    crop_width // 2,
-                )
-            )
+    """Crop mouth patch
+    Returns a list of uint8 gray (crop_height, crop_width) patches.
+    """
+    num_frames = min(num_frames, len(metadata))  #! frames without landmarks are dropped
+    if num_frames == 0:
+        return []
+    transforms = compute_roi_transforms(
+        np.asarray(metadata[:num_frames]),
+        mean_face_metadata,
+        std_size=std_size,
+        window_margin=window_margin,
+        start_idx=start_idx,
+        stop_idx=stop_idx,
+        crop_height=crop_height,
+        crop_width=crop_width,
+    )
+    return list(iter_crop_patches(video_frames, transforms, crop_height, crop_width))
 
-    while q_frame:
-        cur_frame = q_frame.popleft()
-        # -- transform frame
-        trans_frame = apply_transform(trans, cur_frame, std_size)
-        # -- transform metadata
-        trans_metadata = trans(q_metadata.popleft())
-        # -- crop mouth patch
-        sequence.append(
-            cut_patch(
-                trans_frame,
-                trans_metadata[start_idx:stop_idx],
-                crop_height // 2,
-                crop_width // 2,
-            )
-        )
-    return sequence
+def iter_crop_patches(video_frames, transforms, crop_height=96, crop_width=96):
+    """Lazily warp frames with their `compute_roi_transforms` matrices.
+    Only the current frame is held, whatever the clip length.
+    """
+    for frame, transform in zip(video_frames, transforms):
+        yield warp_roi(frame, transform, crop_height, crop_width)
 
-def load_needed_models_for_lip_movement(metadata_path=Path("C:/github/rw/AV-HuBERT-S2S/model-bin")):
-    detector = dlib.get_frontal_face_detector()
+def load_needed_models_for_lip_movement(metadata_path=None):
+    # face detectors are created on first use by `get_face_detector`, only in processes that detect
+    metadata_path = Path(metadata_path or get_model_dir())
     predictor = dlib.shape_predictor(str(metadata_path/"shape_predictor_68_face_landmarks.dat"))
     mean_face_landmarks = np.load(metadata_path/"20words_mean_face.npy")
     return (
-        detector, predictor, mean_face_landmarks
+        predictor, mean_face_landmarks
     )
 
-# Load needed models for lip movement
-DETECTOR, PREDICTOR, MEAN_FACE_LANDMARKS = load_needed_models_for_lip_movement()
-
-def get_video_resolution(video_filepath):
-    for stream in ffmpeg.probe(video_filepath)["streams"]:
-        if stream["codec_type"] == "video":
-            height = int(stream["height"])
-            width = int(stream["width"])
-            return height, width
-    raise TypeError(f"Input file: {video_filepath} doesn't have video stream!")
-
-def split_video_to_frames(video_filepath, fstart=None, fend=None, out_fps=25):
-    # src: https://github.com/kylemcdonald/python-utils/blob/master/ffmpeg.py
-    #NOTE: splitting video into frames is faster on CPU than GPU
-    width, height = get_video_resolution(video_filepath)
-    video_stream = ffmpeg.input(str(video_filepath)).video.filter("fps", fps=out_fps)
-    channels = 3
-    try:
-        if fstart is not None and fend is not None:
-            process = (
-                video_stream.trim(start_frame=fstart, end_frame=fend)
-                .setpts("PTS-STARTPTS")
-                .output("pipe:", format="rawvideo", pix_fmt="bgr24")
-                .run_async(pipe_stdout=True, quiet=True)
-            )
-            frames_counter = 0
-            while frames_counter < fend - fstart:
-                in_bytes = process.stdout.read(width * height * channels)
-                in_frame = np.frombuffer(in_bytes, np.uint8).reshape(
-                    width, height, channels
-                )
-                yield in_frame
-                frames_counter += 1
-        else:
-            process = (
-                video_stream.setpts("PTS-STARTPTS")
-                .output("pipe:", format="rawvideo", pix_fmt="bgr24")
-                .run_async(pipe_stdout=True, quiet=True)
-            )
-            while True:
-                in_bytes = process.stdout.read(width * height * channels)
-                if not in_bytes:
-                    break
-                in_frame = np.frombuffer(in_bytes, np.uint8).reshape(
-                    width, height, channels
-                )
-                yield in_frame
+# Load needed models for lip movement on first use (from `get_model_dir()`), not at import
+_LIP_MODELS = None
+_LIP_MODELS_LOCK = threading.Lock()
 
-    finally:
-        process.stdout.close()
-        process.wait()
+def get_lip_models():
+    """(shape predictor, mean face landmarks) of this process, loaded on first use."""
+    global _LIP_MODELS
+    with _LIP_MODELS_LOCK:
+        if _LIP_MODELS is None:
+            _LIP_MODELS = load_needed_models_for_lip_movement()
+        return _LIP_MODELS
+
+def get_predictor():
+    return get_lip_models()[0]
+
+def get_mean_face_landmarks():
+    return get_lip_models()[1]
+
+def shape_to_coords(shape):
+    return np.array([(point.x, point.y) for point in shape.parts()], dtype=np.int32)
 
 def detect_landmark(image):
     gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+    return detect_landmark_gray(gray)
+
+def detect_landmark_gray(gray, detector="dlib"):
     # print(image.shape, gray.shape)
-    rects = DETECTOR(gray, 1)
-    coords = None
-    for (_, rect) in enumerate(rects):
-        shape = PREDICTOR(gray, rect)
-        coords = np.zeros((68, 2), dtype=np.int32)
-        for i in range(0, 68):
-            coords[i] = (shape.part(i).x, shape.part(i).y)
-    return coords
-
-def linear_interpolate(landmarks, start_idx, stop_idx):
-    start_landmarks = landmarks[start_idx]
-    stop_landmarks = landmarks[stop_idx]
-    delta = stop_landmarks - start_landmarks
-    for idx in range(1, stop_idx - start_idx):
-        landmarks[start_idx + idx] = (
-            start_landmarks + idx / float(stop_idx - start_idx) * delta
-        )
-    return landmarks
+    rect = detect_face_rect(gray, detector=detector)
+    if rect is None:
+        return None
+    return shape_to_coords(get_predictor()(gray, rect))
+
+def detect_face_rect(gray, detect_scale=1.0, upsample=1, detector="dlib"):
+    """Run the `detector` backend (see `face_detectors`) on a (optionally downscaled) frame.
+    Returns the face box in full-frame coordinates (for dlib the last detected face), or None.
+    """
+    return get_face_detector(detector).detect_batch([gray], scale=detect_scale, upsample=upsample)[0]
+
+def detect_faces(gray_frames, detector="dlib", batch_size=16):
+    """Batched detection: face boxes for `batch_size` frames at a time, then the shape predictor's 68 points.
+    Returns the (N, 68, 2) landmarks and the (N,) validity mask.
+    """
+    face_detector, predictor = get_face_detector(detector), get_predictor()
+    landmarks, valid = empty_landmarks(len(gray_frames))
+    for start in range(0, len(gray_frames), batch_size):
+        batch = gray_frames[start:start + batch_size]
+        for idx, (gray, rect) in enumerate(zip(batch, face_detector.detect_batch(batch)), start):
+            if rect is not None:
+                landmarks[idx], valid[idx] = shape_to_coords(predictor(gray, rect)), True
+    return landmarks, valid
+
+def landmarks_to_rect(coords):
+    """Face box around a set of landmarks, used to seed the shape predictor."""
+    x0, y0 = coords.min(axis=0)
+    x1, y1 = coords.max(axis=0)
+    return dlib.rectangle(int(x0), int(y0), int(x1), int(y1))
+
+def detector_box_relation(rect, box):
+    """How a face detector box relates to the landmark box the shape predictor found in it:
+    (width scale, height scale, x shift, y shift), shifts of the center in landmark box sizes.
+    """
+    width, height = max(box.width(), 1), max(box.height(), 1)
+    return (
+        rect.width() / width, rect.height() / height,
+        (rect.left() + rect.right() - box.left() - box.right()) / 2 / width,
+        (rect.top() + rect.bottom() - box.top() - box.bottom()) / 2 / height,
+    )
+
+def detector_shaped_rect(box, relation=DETECTOR_BOX_RELATION):
+    """Seed box for the shape predictor from a landmark box, in the shape of a detector box (see
+    `detector_box_relation`); the predictor was trained on detector boxes, which are
+    larger and sit higher than the tight landmark box, so seeding with that drifts.
+    """
+    scale_w, scale_h, shift_x, shift_y = relation
+    width, height = box.width(), box.height()
+    center_x = (box.left() + box.right()) / 2 + shift_x * width
+    center_y = (box.top() + box.bottom()) / 2 + shift_y * height
+    half_w, half_h = (scale_w * width - 1) / 2, (scale_h * height - 1) / 2  # dlib boxes include both edges
+    return dlib.rectangle(
+        int(round(center_x - half_w)), int(round(center_y - half_h)),
+        int(round(center_x + half_w)), int(round(center_y + half_h)),
+    )
+
+def landmark_drift(coords, rect):
+    """How far (relative to the box size) the landmark box moved or rescaled from its seed box."""
+    box = landmarks_to_rect(coords)
+    size = max(rect.width() + rect.height(), 1)
+    center = box.center()
+    seed_center = rect.center()
+    shift = 2 * max(abs(center.x - seed_center.x), abs(center.y - seed_center.y)) / size
+    rescale = abs(box.width() + box.height() - rect.width() - rect.height()) / size
+    return max(shift, rescale)
+
+def track_landmarks(gray_frames, redetect_interval=TRACK_REDETECT_INTERVAL, detect_scale=0.5, upsample=1, max_drift=0.2, seed_rect=None, detector="dlib"):
+    """Detect-once-then-track landmark localisation over consecutive gray frames.
+
+    The face detector only runs on keyframes (every `redetect_interval` frames)
+    or after tracking is lost, on a frame downscaled by `detect_scale`. On the
+    frames in between, the shape predictor is seeded with a detector-shaped box built from
+    the previous frame's landmark box (`detector_shaped_rect`, with the relation
+    measured on the last keyframe); tracking counts as lost when the new landmark
+    box drifts more than `max_drift` from the previous one. A `seed_rect` (left,
+    top, right, bottom landmark box), e.g. the face box of an earlier clip of the
+    same session, seeds the first frame the same way and saves its cold-start detection.
+    Returns the (N, 68, 2) landmarks, the (N,) validity mask and the number of detector calls.
+    """
+    predictor = get_predictor()
+    landmarks, valid = empty_landmarks(len(gray_frames))
+    detector_calls = 0
+    relation = DETECTOR_BOX_RELATION
+    box = dlib.rectangle(*map(int, seed_rect)) if seed_rect is not None else None  # previous landmark box
+    since_detect = 0
+    for idx, gray in enumerate(gray_frames):
+        coords = None
+        if box is not None and since_detect < redetect_interval:
+            coords = shape_to_coords(predictor(gray, detector_shaped_rect(box, relation)))
+            if landmark_drift(coords, box) > max_drift:
+                coords = None
+        if coords is None:
+            detector_calls += 1
+            since_detect = 0
+            rect = detect_face_rect(gray, detect_scale=detect_scale, upsample=upsample, detector=detector)
+            if rect is not None:
+                coords = shape_to_coords(predictor(gray, rect))
+                relation = detector_box_relation(rect, landmarks_to_rect(coords))
+        box = None
+        if coords is not None:
+            box = landmarks_to_rect(coords)
+            landmarks[idx], valid[idx] = coords, True
+        since_detect += 1
+    return landmarks, valid, detector_calls
+
+def mouth_box(coords, margin=0.25, start_idx=48, stop_idx=68):
+    """(x0, y0, x1, y1) box around the mouth landmarks, grown by `margin` of its size."""
+    mouth = coords[start_idx:stop_idx]
+    (x0, y0), (x1, y1) = mouth.min(axis=0), mouth.max(axis=0)
+    pad_x, pad_y = margin * (x1 - x0), margin * (y1 - y0)
+    return int(x0 - pad_x), int(y0 - pad_y), int(np.ceil(x1 + pad_x)), int(np.ceil(y1 + pad_y))
 
-def landmarks_interpolate(landmarks):
+def motion_score(gray, reference, box):
+    """Mean absolute gray-level difference of `box` between two frames."""
+    height, width = gray.shape[:2]
+    x0, y0, x1, y1 = box
+    x0, y0, x1, y1 = max(x0, 0), max(y0, 0), min(x1, width), min(y1, height)
+    if x1 <= x0 or y1 <= y0:
+        return np.inf
+    return cv2.absdiff(gray[y0:y1, x0:x1], reference[y0:y1, x0:x1]).mean()
+
+def adaptive_landmarks(gray_frames, skip_interval=ADAPTIVE_SKIP_INTERVAL, motion_threshold=ADAPTIVE_MOTION_THRESHOLD, mouth_margin=0.25, detector="dlib"):
+    """Frame-skipping landmark localisation over consecutive gray frames.
+
+    Landmarks are computed on every `skip_interval`-th frame and on the last
+    one; the frames in between are skipped (left to `landmarks_interpolate`)
+    unless their mouth region differs from the last computed frame by more
+    than `motion_threshold` gray levels on average, which forces a fresh
+    detection. Frames are never skipped while no face is known.
+    Returns the (N, 68, 2) landmarks, the (N,) validity mask and the (N,) skipped mask.
+    """
+    num_frames = len(gray_frames)
+    landmarks, valid = empty_landmarks(num_frames)
+    skipped = np.zeros(num_frames, dtype=bool)
+    reference, box, since_detect = None, None, 0
+    for idx, gray in enumerate(gray_frames):
+        if (
+            box is not None
+            and since_detect < skip_interval
+            and idx != num_frames - 1
+            and motion_score(gray, reference, box) <= motion_threshold
+        ):
+            skipped[idx] = True
+            since_detect += 1
+            continue
+        coords = detect_landmark_gray(gray, detector=detector)
+        reference, box, since_detect = gray, None, 1
+        if coords is not None:
+            landmarks[idx], valid[idx] = coords, True
+            box = mouth_box(coords, margin=mouth_margin)
+    return landmarks, valid, skipped
+
+def detect_landmarks(gray_frames, mode="detect", detector="dlib", **options):
+    """Landmarks for a run of consecutive gray frames.
+    mode="detect" runs the detector on every frame (`detect_faces`), mode="track"
+    uses `track_landmarks` and mode="adaptive" uses `adaptive_landmarks`;
+    `detector` names the face detector backend for all of them.
+    Returns the (N, 68, 2) landmarks, the (N,) validity mask, the (N,) mask of
+    frames that were skipped on purpose (never detected, to be interpolated)
+    and a stats dict.
+    """
+    skipped = np.zeros(len(gray_frames), dtype=bool)
+    face_detector = get_face_detector(detector)
+    detector_seconds = face_detector.seconds
+    if mode == "detect":
+        landmarks, valid = detect_faces(gray_frames, detector=detector, **options)
+        detector_calls = len(gray_frames)
+    elif mode == "track":
+        landmarks, valid, detector_calls = track_landmarks(gray_frames, detector=detector, **options)
+    elif mode == "adaptive":
+        landmarks, valid, skipped = adaptive_landmarks(gray_frames, detector=detector, **options)
+        detector_calls = len(gray_frames) - np.count_nonzero(skipped)
+    else:
+        raise ValueError(f"Unknown landmark mode `{mode}`")
+    stats = {
+        "frames": len(landmarks), "detector_calls": int(detector_calls), "skipped": int(skipped.sum()),
+        "detector_seconds": face_detector.seconds - detector_seconds,
+    }
+    return landmarks, valid, skipped, stats
+
+def landmarks_interpolate(landmarks, valid):
     """Interpolate landmarks
-    param list landmarks: landmarks detected in raw videos
+    Fills every invalid frame of the (T, 68, 2) `landmarks` linearly from its
+    nearest valid neighbours and repeats the first / last valid frame at the
+    edges, all in one vectorized pass. Returns a new array, or None if no
+    frame is valid.
     """
-    valid_frames_idx = [idx for idx, _ in enumerate(landmarks) if _ is not None ]
-    if not valid_frames_idx:
+    valid_frames_idx = np.flatnonzero(valid)
+    if not len(valid_frames_idx):
         return None
-    for idx in range(1, len(valid_frames_idx)):
-        if valid_frames_idx[idx] - valid_frames_idx[idx - 1] == 1:
-            continue
-        else:
-            landmarks = linear_interpolate(
-                landmarks, valid_frames_idx[idx - 1], valid_frames_idx[idx]
-            )
-    valid_frames_idx = [idx for idx, _ in enumerate(landmarks) if _ is not None]
-    # -- Corner case: keep frames at the beginning or at the end failed to be detected.
-    if valid_frames_idx:
-        landmarks[: valid_frames_idx[0]] = [
-            landmarks[valid_frames_idx[0]]
-        ] * valid_frames_idx[0]
-        landmarks[valid_frames_idx[-1] :] = [landmarks[valid_frames_idx[-1]]] * (
-            len(landmarks) - valid_frames_idx[-1]
+    frame_idx = np.arange(len(landmarks))
+    pos = np.searchsorted(valid_frames_idx, frame_idx, side="right")
+    last = len(valid_frames_idx) - 1
+    start = valid_frames_idx[np.clip(pos - 1, 0, last)]
+    stop = valid_frames_idx[np.clip(pos, 0, last)]
+    # valid frames and the clip edges have start == stop (or frame == start), i.e. weight 0
+    span = np.maximum(stop - start, 1)
+    weight = (np.clip(frame_idx - start, 0, None) / span).astype(np.float32)[:, None, None]
+    landmarks = np.asarray(landmarks, dtype=np.float32)
+    return landmarks[start] + weight * (landmarks[stop] - landmarks[start])
+
+def get_video_timing(video_filepath):
+    """(start_time, duration) of a video container in seconds."""
+    info = probe_media(video_filepath)["format"]
+    return float(info.get("start_time", 0.0)), float(info.get("duration", 0.0))
+
+def stream_normalized_frames(
+        video_filepath, target_width=640, target_height=480, out_fps=25,
+        start_frame=None, end_frame=None, start_time=None, seek_preroll=2.0,
+    ):
+    """Decode a video in a single ffmpeg pass, yielding normalized bgr24 frames.
+
+    Padding, scaling and fps conversion run as one filter graph and frames are
+    read straight from the pipe, so no intermediate video file is written.
+
+    `start_frame`/`end_frame` decode only that range of the 25 fps output,
+    frame-exactly: ffmpeg seeks to `seek_preroll` seconds before the range,
+    timestamps are rebased on the container `start_time` the way a full decode
+    does, and the fps output is trimmed on its own frame grid. A range decode
+    therefore yields exactly the frames a full decode yields at those indices.
+    """
+    with stage("probe"):
+        width, height = get_video_resolution_for_padding(str(video_filepath))
+    new_width, new_height, pad_left, _, pad_top, _ = calculate_padding(
+        width, height, target_width=target_width, target_height=target_height
+    )
+    frame_size = target_width * target_height * 3
+    if start_frame is None and end_frame is None:
+        stream = (
+            ffmpeg.input(str(video_filepath), **ffmpeg_thread_args())
+            .video.filter("fps", fps=out_fps)
         )
-    valid_frames_idx = [idx for idx, _ in enumerate(landmarks) if _ is not None]
-    assert len(valid_frames_idx) == len(landmarks), "not every frame has landmark"
-    return landmarks
+    else:
+        if start_time is None:
+            start_time, _ = get_video_timing(video_filepath)
+        start_frame = start_frame or 0
+        seek = start_time + start_frame / out_fps - seek_preroll
+        input_args = dict(copyts=None, **ffmpeg_thread_args())
+        if seek > start_time:
+            input_args["ss"] = f"{seek:.6f}"
+        trim_args = {"start": (start_frame - 0.5) / out_fps}
+        if end_frame is not None:
+            trim_args["end"] = (end_frame - 0.5) / out_fps
+        stream = (
+            ffmpeg.input(str(video_filepath), **input_args)
+            .video.setpts(f"PTS-{start_time:.6f}/TB")
+            .filter("fps", fps=out_fps)
+            .trim(**trim_args)
+        )
+    process = (
+        stream
+        .setpts("PTS-STARTPTS")
+        .filter("scale", new_width, new_height)
+        .filter("pad", target_width, target_height, pad_left, pad_top, color="black")
+        .output("pipe:", format="rawvideo", pix_fmt="bgr24")
+        .global_args("-v", "error", *(
+            ["-filter_threads", str(FFMPEG_THREADS)] if FFMPEG_THREADS is not None else []
+        ))
+        .run_async(pipe_stdout=True, quiet=True)
+    )
+    try:
+        while True:
+            in_bytes = process.stdout.read(frame_size)
+            if len(in_bytes) < frame_size:
+                break
+            yield np.frombuffer(in_bytes, np.uint8).reshape(
+                target_height, target_width, 3
+            )
+    finally:
+        process.stdout.close()
+        process.wait()
 
 def extract_lip_movement(
         webcam_video,
-        in_video_filepath,
         out_lip_filepath,
+        preview_filepath=None,
         num_workers=10,
+        landmark_pool=None,
+        landmark_cache=None,
+        crop_kwargs=None,
+        landmark_mode="detect",
+        landmark_options=None,
+        streaming=False,
+        face_seed=None,
     ):
-    # change video framerate to 25 and lower resolution for faster processing
-    print("Adjust video framerate to 25")
-    
-    FFmpeg(
-        inputs={webcam_video: None},
-        outputs={in_video_filepath: "-v quiet -filter:v fps=fps=25 -vf scale=640:480 -y"},
-    ).run()
-    # convert video to a list of frames
-    print("Converting video into frames")
-    frames = list(split_video_to_frames(in_video_filepath))
-    
-    # Get face landmarks from video 
-    print("Extract face landmarks from video frames")
-    # landmarks = [
-    #     detect_landmark(frame)
-    #     for frame in tqdm(frames, desc="Detecting Lip Movement")
-    # ]
-    landmarks = process_map(
-        detect_landmark,
-        frames,
-        desc="Detecting Lip Movement",
-        max_workers=num_workers
-    )
-    invalid_landmarks_ratio = sum(lnd is None for lnd in landmarks) / len(landmarks)
+    """Crop the mouth region of `webcam_video` into `out_lip_filepath`.
+    The crops are stored losslessly as a uint8 gray `.npy` (see `lip_roi`); an
+    mp4 preview is only encoded when `preview_filepath` is given.
+    `landmark_mode`/`landmark_options` select how landmarks are localised (see
+    `detect_landmarks`); "track" runs the face detector only on keyframes.
+
+    With `streaming=True` frames are never materialised: a first decode pass
+    streams frames through landmark detection and only the landmarks are kept,
+    a second pass streams frames through cropping into the encoder. Peak memory
+    no longer grows with the clip length (at the cost of a second decode, so
+    it's meant for long videos).
+
+    `face_seed`, a face box of an earlier clip with the same framing, seeds
+    track mode (see `track_landmarks`). Returns the face box of this clip for
+    seeding the next one, or None when the face wasn't found well enough.
+    """
+    landmark_options = seeded_landmark_options(landmark_mode, landmark_options or {}, face_seed)
+    crop_kwargs = crop_kwargs or {}
+
+    # pad, scale to 640x480 and change framerate to 25 in a single decode pass
+    def decode_frames():
+        return stream_normalized_frames(webcam_video)
+
+    frames = None
+    if not streaming:
+        print("Decoding video frames (pad, scale, fps=25)")
+        # pad / fps / scale are one ffmpeg graph, so they are timed together as "decode";
+        # when streaming, decoding is part of whichever stage consumes the frames
+        with stage("decode"):
+            frames = list(decode_frames())
+
+    landmarks, valid, skipped, cache_key = None, None, None, None
+    if landmark_cache is not None:
+        cache_key = landmark_cache_key(landmark_cache, webcam_video, landmark_mode, landmark_options)
+        with stage("landmark_cache"):
+            cached = landmark_cache.get(cache_key)
+        if cached is not None and (frames is None or len(cached[0]) == len(frames)):
+            print("📦 Using cached face landmarks")
+            landmarks, valid, skipped = cached
+
+    if landmarks is None:
+        # Get face landmarks from video 
+        print("Extract face landmarks from video frames")
+        # landmarks = [
+        #     detect_landmark(frame)
+        #     for frame in tqdm(frames, desc="Detecting Lip Movement")
+        # ]
+        # frames go through the shared landmark pool instead of a fresh process pool per video;
+        # in track mode every pool task is one keyframe interval
+        landmark_pool = landmark_pool or get_landmark_pool(num_workers)
+        with stage("landmark_detect", mode=landmark_mode):
+            landmarks, valid, skipped, stats = landmark_pool.detect(
+                decode_frames() if streaming else frames,
+                mode=landmark_mode,
+                chunk_size=landmark_chunk_size(landmark_mode, landmark_options),
+                **landmark_options
+            )
+        print_landmark_stats(stats)
+        if landmark_cache is not None:
+            landmark_cache.put(cache_key, landmarks, valid, skipped)
+    invalid_landmarks_ratio = invalid_ratio(valid, skipped)
     print(f"Current invalid frame ratio ({invalid_landmarks_ratio}) ")
     if invalid_landmarks_ratio > MAX_MISSING_FRAMES_RATIO:
         logging.info(
             "Invalid frame ratio exceeded maximum allowed ratio!! " +
             "Starting resizing the recorded video!!"
         )
-        sequence = resize_frames(frames)
+        if streaming:
+            sequence = (cv2.resize(frame, (640, 480)) for frame in decode_frames())
+        else:
+            sequence = resize_frames(frames)
     else:
         # interpolate frames not being detected (if found).
-        if invalid_landmarks_ratio != 0:
+        if not valid.all():
             print("Linearly-interpolate invalid landmarks")
-            continuous_landmarks = landmarks_interpolate(landmarks)
+            with stage("interpolate"):
+                continuous_landmarks = landmarks_interpolate(landmarks, valid)
         else:
             continuous_landmarks = landmarks
         # crop mouth regions
         print("Cropping the mouth region.")
-        sequence = crop_patch(
-            frames,
-            len(frames),
-            continuous_landmarks,
-            MEAN_FACE_LANDMARKS,
-        )
+        with stage("crop"):
+            if streaming:
+                # only the transforms here, the warps run lazily during "save"
+                transforms = compute_roi_transforms(
+                    continuous_landmarks, get_mean_face_landmarks(), **crop_kwargs
+                )
+                sequence = iter_crop_patches(
+                    decode_frames(), transforms,
+                    crop_kwargs.get("crop_height", 96), crop_kwargs.get("crop_width", 96),
+                )
+            else:
+                sequence = crop_patch(
+                    frames,
+                    len(frames),
+                    continuous_landmarks,
+                    get_mean_face_landmarks(),
+                    **crop_kwargs,
+                )
     # return lip-movement frames
-    save_video(sequence, out_lip_filepath, fps=25)
+    with stage("save"):
+        save_lip_movement(sequence, out_lip_filepath, preview_filepath)
+    if invalid_landmarks_ratio <= MAX_MISSING_FRAMES_RATIO:
+        return face_rect(landmarks, valid, skipped)
 
-def get_video_resolution_for_padding(video_path):
-    command = [
-        'ffprobe', '-v', 'error',
-        '-select_streams', 'v:0',
-        '-show_entries', 'stream=width,height',
-        '-of', 'json', video_path
+def landmark_chunk_size(landmark_mode, landmark_options):
+    """Frames per landmark pool task; in track mode every task is one keyframe interval,
+    in adaptive mode `ADAPTIVE_TASK_SKIPS` skip intervals (each task detects on its first
+    and last frame, so longer tasks waste fewer detections) and in detect mode one
+    detector batch.
+    """
+    if landmark_mode == "track":
+        return landmark_options.get("redetect_interval", TRACK_REDETECT_INTERVAL)
+    if landmark_mode == "adaptive":
+        return landmark_options.get("skip_interval", ADAPTIVE_SKIP_INTERVAL) * ADAPTIVE_TASK_SKIPS
+    return landmark_options.get("batch_size")
+
+def landmark_cache_key(landmark_cache, webcam_video, landmark_mode, landmark_options):
+    landmark_options = dict(landmark_options)
+    detector = landmark_options.pop("detector", "dlib")
+    if "seed_rect" in landmark_options:
+        # the seed box itself changes from run to run, only whether one was used matters
+        landmark_options["seed_rect"] = True
+    if landmark_mode in ("track", "adaptive"):
+        # every pool task starts with a keyframe detection, so the task length decides
+        # where the detector runs, default interval included
+        landmark_options["task_frames"] = landmark_chunk_size(landmark_mode, landmark_options)
+    return landmark_cache.key(
+        webcam_video, width=640, height=480, fps=25, detector=detector,
+        mode=landmark_mode, **landmark_options
+    )
+
+def seeded_landmark_options(landmark_mode, landmark_options, face_seed):
+    """`landmark_options` with the `face_seed` box for `track_landmarks`; other modes ignore seeds."""
+    if face_seed is None or landmark_mode != "track":
+        return landmark_options
+    return dict(landmark_options, seed_rect=tuple(face_seed))
+
+def face_rect(landmarks, valid, skipped=None):
+    """(left, top, right, bottom) box around the last detected landmarks of a clip, or None."""
+    detected = valid if skipped is None else valid & ~skipped
+    if not detected.any():
+        return None
+    rect = landmarks_to_rect(landmarks[np.flatnonzero(detected)[-1]])
+    return rect.left(), rect.top(), rect.right(), rect.bottom()
+
+def print_landmark_stats(stats):
+    print(f"Face detector ran on {stats['detector_calls']} / {stats['frames']} frames")
+    if stats.get("detector_seconds"):
+        print(f"Face detector throughput: {stats['detector_calls'] / stats['detector_seconds']:.1f} frames/s")
+    if stats["skipped"]:
+        print(f"Skipped {stats['skipped']} / {stats['frames']} frames (interpolated)")
+
+def invalid_ratio(valid, skipped):
+    # frames skipped on purpose are not failures, only detected frames count
+    num_detected = len(valid) - np.count_nonzero(skipped)
+    return 1 - np.count_nonzero(valid) / max(num_detected, 1)
+
+def save_lip_movement(frames, lip_roi_filepath, preview_filepath=None, fps=25):
+    """Write lip frames to the ROI file and, optionally, to an mp4 preview in the same pass."""
+    with LipRoiWriter(lip_roi_filepath) as writer:
+        frames = writer.passthrough(frames)
+        if preview_filepath is not None:
+            save_video(frames, preview_filepath, fps=fps)
+        for _ in frames:  # whatever the preview didn't consume
+            pass
+    if writer.num_frames:  # an empty clip is skipped with a warning, see `LipRoiWriter`
+        print(f"✅ Lip ROI ({writer.num_frames} frames) saved to: {lip_roi_filepath}")
+
+def detect_landmarks_chunked(landmark_pool, decode_chunk, num_chunks, landmark_mode, landmark_options, max_parallel_chunks):
+    """`landmark_pool.detect` over the frames of `decode_chunk(idx)` for every chunk, in parallel, joined.
+    Chunks must be whole numbers of landmark tasks (`landmark_chunk_size`) long, except the last;
+    then every task, and so the landmarks, match one `detect` call over the whole video.
+    Returns the joined landmarks, validity and skipped masks and the summed stats.
+    """
+    chunk_size = landmark_chunk_size(landmark_mode, landmark_options)
+
+    def detect_chunk(idx):
+        # like the serial pipeline, only the task holding frame 0 starts from the seed
+        chunk_options = landmark_options if idx == 0 else \
+            {key: value for key, value in landmark_options.items() if key != "seed_rect"}
+        return landmark_pool.detect(
+            decode_chunk(idx),
+            mode=landmark_mode,
+            chunk_size=chunk_size,
+            desc=f"Detecting Lip Movement (chunk {idx + 1}/{num_chunks})",
+            **chunk_options
+        )
+
+    with ThreadPoolExecutor(max_workers=max_parallel_chunks) as executor:
+        results = list(executor.map(detect_chunk, range(num_chunks)))
+    landmarks, valid, skipped = (np.concatenate([result[i] for result in results]) for i in range(3))
+    stats = {key: sum(result[3][key] for result in results) for key in results[0][3]}
+    return landmarks, valid, skipped, stats
+
+def extract_lip_movement_chunked(
+        webcam_video,
+        out_lip_filepath,
+        preview_filepath=None,
+        chunk_frames=CHUNK_FRAMES,
+        max_parallel_chunks=None,
+        num_workers=10,
+        landmark_pool=None,
+        landmark_cache=None,
+        crop_kwargs=None,
+        landmark_mode="detect",
+        landmark_options=None,
+        face_seed=None,
+    ):
+    """`extract_lip_movement` for long videos, with time chunks processed in parallel.
+
+    Every chunk is decoded on its own (a frame range of `stream_normalized_frames`)
+    twice: once through landmark detection, once through cropping straight into
+    its slice of the output ROI file. The landmark smoothing window spans chunk
+    boundaries, so the transforms are not computed per chunk but once over the
+    joined landmarks of the whole video, which are small. Chunks start on
+    landmark task boundaries (keyframes in track/adaptive mode), so the output
+    is identical to the serial pipeline. `face_seed` and the return value are
+    as in `extract_lip_movement`.
+    """
+    landmark_options = seeded_landmark_options(landmark_mode, landmark_options or {}, face_seed)
+    crop_kwargs = crop_kwargs or {}
+    task_frames = landmark_chunk_size(landmark_mode, landmark_options) or 1
+    chunk_frames = -(-chunk_frames // task_frames) * task_frames
+    start_time, duration = get_video_timing(webcam_video)
+    num_chunks = max(1, int(np.ceil(duration * 25 / chunk_frames)))
+    # the last chunk is open-ended, so a short duration estimate loses no frames
+    bounds = [
+        (idx * chunk_frames, (idx + 1) * chunk_frames if idx < num_chunks - 1 else None)
+        for idx in range(num_chunks)
     ]
-    result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    max_parallel_chunks = max_parallel_chunks or min(num_chunks, os.cpu_count())
 
-    try:
-        output = result.stdout.decode().strip()
-        if not output:
-            raise ValueError("Empty output from ffprobe")
+    def decode_chunk(idx):
+        start_frame, end_frame = bounds[idx]
+        return stream_normalized_frames(
+            webcam_video, start_frame=start_frame, end_frame=end_frame, start_time=start_time
+        )
 
-        video_info = json.loads(output)
+    landmarks, valid, skipped, cache_key = None, None, None, None
+    if landmark_cache is not None:
+        cache_key = landmark_cache_key(landmark_cache, webcam_video, landmark_mode, landmark_options)
+        with stage("landmark_cache"):
+            cached = landmark_cache.get(cache_key)
+        if cached is not None:
+            print("📦 Using cached face landmarks")
+            landmarks, valid, skipped = cached
 
-        if "streams" not in video_info or not video_info["streams"]:
-            raise ValueError(f"No video streams found for {video_path}")
-        
-        width = video_info["streams"][0]["width"]
-        height = video_info["streams"][0]["height"]
-        return width, height
+    if landmarks is None:
+        print(f"Extract face landmarks from video frames ({num_chunks} chunks)")
+        landmark_pool = landmark_pool or get_landmark_pool(num_workers)
+        with stage("landmark_detect", mode=landmark_mode):
+            landmarks, valid, skipped, stats = detect_landmarks_chunked(
+                landmark_pool, decode_chunk, num_chunks, landmark_mode, landmark_options, max_parallel_chunks
+            )
+        print_landmark_stats(stats)
+        if landmark_cache is not None:
+            landmark_cache.put(cache_key, landmarks, valid, skipped)
 
-    except Exception as e:
-        print(f"❌ ffprobe failed for {video_path}")
-        print("⚠️ Raw ffprobe output:", result.stdout.decode())
-        print("⚠️ ffprobe stderr:", result.stderr.decode())
-        raise e
+    num_frames = len(landmarks)
+    invalid_landmarks_ratio = invalid_ratio(valid, skipped)
+    print(f"Current invalid frame ratio ({invalid_landmarks_ratio}) ")
+    if invalid_landmarks_ratio > MAX_MISSING_FRAMES_RATIO:
+        logging.info(
+            "Invalid frame ratio exceeded maximum allowed ratio!! " +
+            "Starting resizing the recorded video!!"
+        )
+        sequence = (cv2.resize(frame, (640, 480)) for frame in stream_normalized_frames(webcam_video))
+        with stage("save"):
+            save_lip_movement(sequence, out_lip_filepath, preview_filepath)
+        return None
+
+    continuous_landmarks = landmarks
+    if not valid.all():
+        print("Linearly-interpolate invalid landmarks")
+        with stage("interpolate"):
+            continuous_landmarks = landmarks_interpolate(landmarks, valid)
+    crop_height, crop_width = crop_kwargs.get("crop_height", 96), crop_kwargs.get("crop_width", 96)
+    transforms = compute_roi_transforms(continuous_landmarks, get_mean_face_landmarks(), **crop_kwargs)
+    offsets = [min(start_frame, num_frames) for start_frame, _ in bounds] + [num_frames]
+
+    print(f"Cropping the mouth region ({num_chunks} chunks)")
+    with stage("crop"), LipRoiMemmap(out_lip_filepath, (num_frames, crop_height, crop_width)) as roi, \
+            ThreadPoolExecutor(max_workers=max_parallel_chunks) as executor:
+
+        def crop_chunk(idx):
+            start, stop = offsets[idx], offsets[idx + 1]
+            patches = iter_crop_patches(decode_chunk(idx), transforms[start:stop], crop_height, crop_width)
+            count = 0
+            for count, patch in enumerate(patches, start=1):
+                roi.array[start + count - 1] = patch
+            if count != stop - start:
+                raise RuntimeError(
+                    f"Chunk {idx} of {webcam_video} decoded {count} frames, expected {stop - start}"
+                )
+
+        list(executor.map(crop_chunk, range(num_chunks)))
+    print(f"✅ Lip ROI ({num_frames} frames) saved to: {out_lip_filepath}")
+    if preview_filepath is not None:
+        with stage("save"):
+            save_video(load_lip_roi(out_lip_filepath), preview_filepath, fps=25)
+    return face_rect(landmarks, valid, skipped)
+
+def get_video_resolution_for_padding(video_path):
+    # cached per (path, mtime, size), see `media_probe.prefetch_probes` for batches
+    try:
+        stream = video_stream(probe_media(video_path))
+    except ValueError as e:
+        raise ValueError(f"{e} for {video_path}")
+    return stream["width"], stream["height"]
 
 
 def calculate_padding(width, height, target_width, target_height):
@@ -395,34 +867,13 @@ def calculate_padding(width, height, target_width, target_height):
 
     return new_width, new_height, pad_left, pad_right, pad_top, pad_bottom
 
-def pad_video(input_path, output_path, target_width=640, target_height=480):
-    """Pad the video to ensure it fits"""
-    width, height = get_video_resolution_for_padding(input_path)
-    
-    print("Original video resolution:", width, height)
-    new_width, new_height, pad_left, pad_right, pad_top, pad_bottom = calculate_padding(width, height, target_width=target_width, target_height=target_height)
-
-    # Create padding command
-    command = [
-        'ffmpeg', '-i', input_path, '-vf',
-        f"scale={new_width}:{new_height},pad={target_width}:{target_height}:{pad_left}:{pad_top}:black",
-        '-c:a', 'copy', output_path, '-v', 'quiet', '-y'
-    ]
-
-    # Run ffmpeg command
-    subprocess.run(command)
-    print("Padded video resolution:", new_width, new_height)
-
-
 def add_noise(signal, noise, snr):
     """
     signal: 1D tensor in [-32768, 32767] (16-bit depth)
     noise: 1D tensor in [-32768, 32767] (16-bit depth)
     snr: tuple or float
+    One mixture of `mix_noise_batch`; sweeps over many noises/SNRs should call that directly.
     """
-    signal = signal.astype(np.float32)
-    noise = noise.astype(np.float32)
-
     if type(snr) == tuple:
         assert len(snr) == 2
         snr = np.random.uniform(snr[0], snr[1])
@@ -436,22 +887,7 @@ def add_noise(signal, noise, snr):
         start = 0
         noise = noise[start : start + len(signal)]
 
-    amp_s = np.sqrt(np.mean(np.square(signal), axis=-1))
-    amp_n = np.sqrt(np.mean(np.square(noise), axis=-1))
-    noise = noise * (amp_s / amp_n) / (10 ** (snr / 20))
-    mixed = signal + noise
-
-    # Avoid clipping noise
-    max_int16 = np.iinfo(np.int16).max
-    min_int16 = np.iinfo(np.int16).min
-    if mixed.max(axis=0) > max_int16 or mixed.min(axis=0) < min_int16:
-        if mixed.max(axis=0) >= abs(mixed.min(axis=0)):
-            reduction_rate = max_int16 / mixed.max(axis=0)
-        else:
-            reduction_rate = min_int16 / mixed.min(axis=0)
-        mixed = mixed * (reduction_rate)
-    mixed = mixed.astype(np.int16)
-    return mixed
+    return mix_noise_batch(signal, noise[None], snr)[0]
 
 # def mix_audio_with_noise(webcam_video, audio_file, out_file, noise_wav_file, snr):
 #     # get audio from webcam video
@@ -489,36 +925,71 @@ def mix_audio_with_noise(webcam_video, audio_file, out_file, noise_wav_file, snr
     print(f"Audio mixed with noise saved at {out_file}")
     return mixed
 
-def process_raw_data_for_avsr(input_file_path, output_dir=None, noise_wav_file=None, noise_snr=None):
+def process_raw_data_for_avsr(
+        input_file_path, output_dir=None, noise_wav_file=None, noise_snr=None,
+        landmark_pool=None, landmark_cache=None, crop_kwargs=None, overwrite=False,
+        landmark_mode="detect", landmark_options=None, streaming=False, save_preview=True,
+        chunk_frames=None, scratch=None, face_seed=None,
+    ):
+    """Extract the lip movement for `input_file_path`.
+    The lossless `_lip_movement.npy` ROI file is what inference reads; the
+    `_lip_movement.mp4` preview is only produced with `save_preview=True`.
+    Pass a `LandmarkCache` together with `overwrite=True` to re-crop an existing
+    output with new `crop_kwargs` (see `crop_patch`) without re-running face detection.
+    `chunk_frames` processes long videos as parallel chunks of that many frames
+    (see `extract_lip_movement_chunked`). Intermediates such as the remuxed
+    preview go to the `scratch` space (default: `get_scratch()`), not next to
+    the outputs. The returned "face_rect" (None when the lip movement already
+    existed) can seed the next clip of the same session through `face_seed`.
+    """
     assert input_file_path.endswith(".mp4"), f"Input file must end with .mp4, but got {input_file_path}"
     
     input_video_path = Path(input_file_path)
     input_file_name = input_video_path.stem.replace(" ", "_")
     outpath = Path(output_dir) if output_dir else input_video_path.parent
-    ctime = int(time.time())
-
-    norm_video_filepath = outpath / f"{input_file_name}_normalized_video_{ctime}.mp4"
-    video_filepath = outpath / f"{input_file_name}_video_{ctime}.mp4"
-    lip_video_filepath = outpath / f"{input_file_name}_lip_movement.mp4"
-    noisy_lip_filepath = outpath / f"{input_file_name}_noisy_lip_movement_{ctime}.mp4"
+    scratch = scratch or get_scratch()
 
-    pad_video(input_video_path, norm_video_filepath)
+    lip_roi_filepath = outpath / f"{input_file_name}_lip_movement.npy"
+    lip_video_filepath = outpath / f"{input_file_name}_lip_movement.mp4" if save_preview else None
+    noisy_lip_filepath = scratch.path(input_video_path, "noisy_lip_movement")
 
     # Step 1: Extract lip movement
-    if not lip_video_filepath.exists():
-        extract_lip_movement(
-            norm_video_filepath, video_filepath, lip_video_filepath,
-            num_workers=min(os.cpu_count(), 5)
+    clip_face_rect = None
+    if overwrite or not lip_roi_filepath.exists():
+        if chunk_frames:
+            extract = partial(extract_lip_movement_chunked, chunk_frames=chunk_frames)
+        else:
+            extract = partial(extract_lip_movement, streaming=streaming)
+        clip_face_rect = extract(
+            input_video_path, lip_roi_filepath, lip_video_filepath,
+            num_workers=min(os.cpu_count(), 5),
+            landmark_pool=landmark_pool,
+            landmark_cache=landmark_cache,
+            crop_kwargs=crop_kwargs,
+            landmark_mode=landmark_mode,
+            landmark_options=landmark_options,
+            face_seed=face_seed,
         )
     else:
-        print(f"📼 Using existing lip movement video at {lip_video_filepath}")
+        print(f"📼 Using existing lip movement at {lip_roi_filepath}")
+        if save_preview and not lip_video_filepath.exists():
+            save_video(load_lip_roi(lip_roi_filepath), lip_video_filepath, fps=25)
+
+    if not save_preview:
+        return {
+            "lip_movement": lip_roi_filepath,
+            "audio": None,
+            "lip_video_path": None,
+            "face_rect": clip_face_rect,
+        }
 
     # Step 2: Combine lip movement video without audio
     try:
-        FFmpeg(
-            inputs={lip_video_filepath: None},
-            outputs={noisy_lip_filepath: "-v quiet -c:v copy -an -y"}  # -an disables audio
-        ).run(timeout=20)
+        with stage("remux"):
+            FFmpeg(
+                inputs={lip_video_filepath: None},
+                outputs={noisy_lip_filepath: "-v quiet -c:v copy -an -y"}  # -an disables audio
+            ).run(timeout=20)
     except subprocess.TimeoutExpired:
         print("⏱️ ffmpeg process timeout. Forcing exit.")
     
@@ -531,11 +1002,13 @@ def process_raw_data_for_avsr(input_file_path, output_dir=None, noise_wav_file=N
             return None
         else:
             print(f"✅ File appeared after short wait.")
+    scratch.register(noisy_lip_filepath)
 
     return {
-        "lip_movement": lip_video_filepath,
+        "lip_movement": lip_roi_filepath,
         "audio": None,
-        "lip_video_path": noisy_lip_filepath
+        "lip_video_path": noisy_lip_filepath,
+        "face_rect": clip_face_rect,
     }
 
 
@@ -546,8 +1019,10 @@ if __name__ == "__main__":
     parser.add_argument("--video-dir", type=str, required=True)
     parser.add_argument("--output-dir", type=str, required=True)
     parser.add_argument("--file-name", type=str, required=True)
+    parser.add_argument("--chunk-frames", type=int, default=None, help="process long videos as parallel chunks of this many frames")
+    parser.add_argument("--detector", type=str, default="dlib", help="face detector backend (dlib, opencv_dnn)")
 
     args = parser.parse_args()
 
     input_path = os.path.join(args.video_dir, args.file_name)
-    process_raw_data_for_avsr(input_path)
+    process_raw_data_for_avsr(input_path, chunk_frames=args.chunk_frames, landmark_options={"detector": args.detector})
@@ -37,9 +37,9 @@ class SubModel(nn.Module):
         self.proj = nn.Linear(input_dim, cfg.encoder_embed_dim)
         # self.encoder = TransformerEncoder(cfg) if cfg.encoder_layers > 0 else None
 
-    def forward(self, x):
+    def forward(self, x, padding_mask=None):
         if self.resnet is not None:
-            x = self.resnet(x)
+            x = self.resnet(x, padding_mask=padding_mask)
         x = self.proj(x.transpose(1, 2))
         # if self.encoder is not None:
         #     x = self.encoder(x)[0].transpose(1, 2)
@@ -244,15 +244,16 @@ class AVHubertModel(PreTrainedModel):
 
         return x, mask_indices
 
-    def forward_features(self, source: torch.Tensor, modality: str) -> torch.Tensor:
+    def forward_features(self, source: torch.Tensor, modality: str, padding_mask: Optional[torch.Tensor] = None) -> torch.Tensor:
+        """`source` of the video modality may be uint8 frames, the frontend crops and normalizes them."""
         extractor = eval(f"self.feature_extractor_{modality}")
         if self.feature_grad_mult > 0:
-            features = extractor(source)
+            features = extractor(source, padding_mask=padding_mask)
             if self.feature_grad_mult != 1.0:
                 features = GradMultiply.apply(features, self.feature_grad_mult)
         else:
             with torch.no_grad():
-                features = extractor(source)
+                features = extractor(source, padding_mask=padding_mask)
         return features
 
     def forward_targets(
@@ -306,8 +307,12 @@ class AVHubertModel(PreTrainedModel):
         features_only: bool = False,
         output_layer: Optional[int] = None,
         video: Optional[torch.Tensor] = None,
+        video_features: Optional[torch.Tensor] = None,
     ) -> Dict[str, torch.Tensor]:
-        """output layer is 1-based"""
+        """output layer is 1-based
+        `video_features` are precomputed `forward_features(video, 'video')` outputs ([B or 1, F, T]);
+        they replace the video frontend, e.g. to share one clip's ResNet pass across many audio variants.
+        """
         src_audio, src_video = source['audio'], source['video']
         if mask and self.masking_type == 'input':
             src_video, mask_indices_video = self.apply_input_mask(src_video, padding_mask, target_list)
@@ -317,7 +322,10 @@ class AVHubertModel(PreTrainedModel):
             src_audio, src_video, mask_indices = src_audio, src_video, None
 
         features_audio = self.forward_features(src_audio, modality='audio') # features: [B, F, T]
-        features_video = self.forward_features(src_video, modality='video')
+        if video_features is None:
+            features_video = self.forward_features(src_video, modality='video', padding_mask=padding_mask)
+        else:
+            features_video = video_features.expand(features_audio.size(0), -1, -1)
         modality_drop_prob, audio_drop_prob = np.random.random(), np.random.random()
         if self.training:
             if modality_drop_prob < self.modality_dropout:
@@ -356,7 +364,7 @@ class AVHubertModel(PreTrainedModel):
         # mask_indices: (B, T), bool
         x = self.encoder(
             x,
-            # attention_mask=padding_mask,
+            attention_mask=None if padding_mask is None else ~padding_mask,
             # layer=None if output_layer is None else output_layer - 1
         )[0]
 
@@ -388,14 +396,18 @@ class AVHubertModel(PreTrainedModel):
         input_features: torch.Tensor,
         attention_mask: Optional[torch.Tensor] = None,
         video: torch.Tensor = None,
+        video_features: torch.Tensor = None,
         **kwargs,
     ) -> Tuple[torch.Tensor, torch.Tensor]:
+        # `attention_mask` follows the transformers convention (True = frame, False = padding),
+        # `padding_mask` the fairseq one (True = padding)
         res = self.forward_gen(
             {"audio": input_features, "video": video},
-            padding_mask=attention_mask,
+            padding_mask=None if attention_mask is None else ~attention_mask.bool(),
             mask=False,
             features_only=True,
             output_layer=None,
+            video_features=video_features,
         )
         feature = res["x"]
         return BaseModelOutput(last_hidden_state=feature, hidden_states=None, attentions=None)
@@ -431,10 +443,10 @@ class AVHubertModel(PreTrainedModel):
             features_audio = self.forward_features(src_audio, modality='audio') # features: [B, F, T]
             features_video = features_audio.new_zeros(features_audio.size(0), self.encoder_embed_dim, features_audio.size(-1))
         elif src_audio is None and src_video is not None:
-            features_video = self.forward_features(src_video, modality='video')
+            features_video = self.forward_features(src_video, modality='video', padding_mask=padding_mask)
             features_audio = features_video.new_zeros(features_video.size(0), self.encoder_embed_dim, features_video.size(-1))
         elif src_audio is not None and src_video is not None:
-            features_video = self.forward_features(src_video, modality='video')
+            features_video = self.forward_features(src_video, modality='video', padding_mask=padding_mask)
             features_audio = self.forward_features(src_audio, modality='audio') # features: [B, F, T]
 
         if self.modality_fuse == 'concat':
@@ -465,7 +477,7 @@ class AVHubertModel(PreTrainedModel):
         # mask_indices: (B, T), bool
         x = self.encoder(
             x,
-            # padding_mask=padding_mask,
+            attention_mask=None if padding_mask is None else ~padding_mask,
             # layer=None if output_layer is None else output_layer - 1
         )[0]
 
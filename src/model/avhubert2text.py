@@ -14,6 +14,13 @@ class AV2TextModel(Speech2TextModel):
         self.lm_head = nn.Linear(config.d_model, self.config.vocab_size, bias=False)
         self.lm_head.weight = self.decoder.embed_tokens.weight
 
+    def _get_feature_vector_attention_mask(self, feature_vector_length, attention_mask):
+        # the AV-HuBERT encoder keeps the input frame rate (no conv subsampling like Speech2Text),
+        # so the decoder's cross-attention mask is the input mask itself: 1 = frame, 0 = padding
+        if len(attention_mask.shape) > 2:
+            attention_mask = attention_mask[:, :, -1]
+        return attention_mask[:, :feature_vector_length].long()
+
 class AV2TextForConditionalGeneration(Speech2TextForConditionalGeneration):
     config_class = AV2TextConfig
     def __init__(self, config):
@@ -124,10 +124,14 @@ class ResNet(nn.Module):
         return x
 
 class ResEncoder(nn.Module):
-    def __init__(self, relu_type, weights):
+    def __init__(self, relu_type, weights, image_crop_size=88, image_mean=0.421, image_std=0.165):
         super(ResEncoder, self).__init__()
         self.frontend_nout = 64
         self.backend_out = 512
+        # crop and normalization of uint8 input, the same as `load_video_features` does on the host
+        self.image_crop_size = image_crop_size
+        self.image_mean = image_mean
+        self.image_std = image_std
         frontend_relu = nn.PReLU(num_parameters=self.frontend_nout) if relu_type == 'prelu' else nn.ReLU()
         self.frontend3D = nn.Sequential(
             nn.Conv3d(1, self.frontend_nout, kernel_size=(5, 7, 7), stride=(1, 2, 2), padding=(2, 3, 3), bias=False),
@@ -148,7 +152,8 @@ class ResEncoder(nn.Module):
             self.frontend3D.load_state_dict(frontend_std)
             self.trunk.load_state_dict(trunk_std)
 
-    def forward(self, x):
+    def forward(self, x, padding_mask=None):
+        x = self.prepare_input(x, padding_mask)
         B, C, T, H, W = x.size()
         x = self.frontend3D(x)
         Tnew = x.shape[2]
@@ -158,6 +163,22 @@ class ResEncoder(nn.Module):
         x = x.transpose(1, 2).contiguous()
         return x
 
+    def prepare_input(self, x, padding_mask=None):
+        """Center-crop [B, C, T, H, W] frames to `image_crop_size`; uint8 frames are also normalized
+        (already normalized float input passes through). Padded frames (`padding_mask` [B, T],
+        True = padding) of uint8 input are zeroed after normalization, as host-side padding is.
+        """
+        H, W = x.shape[-2:]
+        th = tw = self.image_crop_size
+        if H > th or W > tw:
+            delta_h, delta_w = int(round(H - th) / 2.), int(round(W - tw) / 2.)
+            x = x[..., delta_h:delta_h + th, delta_w:delta_w + tw]
+        if x.dtype == torch.uint8:
+            x = (x.to(self.frontend3D[0].weight.dtype) / 255.0 - self.image_mean) / self.image_std
+            if padding_mask is not None:
+                x = x.masked_fill(padding_mask[:, None, :, None, None], 0.0)
+        return x
+
     def threeD_to_2D_tensor(self, x):
         n_batch, n_channels, s_time, sx, sy = x.shape
         x = x.transpose(1, 2).contiguous()
@@ -0,0 +1,77 @@
+import numpy as np
+import torch
+
+from .dataset.load_data import load_noisy_features
+from .dataset.noise_mixing import NoiseBank
+from .profiling import stage
+
+
+class NoiseGrid(object):
+    """An SNR x noise-type grid over one `NoiseBank` of all noise files.
+
+    `noise_files` maps a noise type to its WAVs (like `load_noise_samples` in
+    app.py); every condition mixes in one randomly picked file of its type.
+    """
+
+    def __init__(self, noise_files, snrs):
+        self.noise_types = sorted(noise_files)
+        self.snrs = [float(snr) for snr in snrs]
+        files, self.type_indices = [], {}
+        for noise_type in self.noise_types:
+            self.type_indices[noise_type] = list(range(len(files), len(files) + len(noise_files[noise_type])))
+            files.extend(noise_files[noise_type])
+        self.bank = NoiseBank(files)
+        self.conditions = [(noise_type, snr) for noise_type in self.noise_types for snr in self.snrs]
+
+    def __len__(self):
+        return len(self.conditions)
+
+    def draw(self, rng):
+        """Per condition: its SNR and the bank index of a random file of its noise type."""
+        snrs = np.array([snr for _, snr in self.conditions], dtype=np.float32)
+        indices = [rng.choice(self.type_indices[noise_type]) for noise_type, _ in self.conditions]
+        return snrs, indices
+
+
+@torch.no_grad()
+def generate_sweep(model, video_source, audio_source, padding_mask, batch_size=8, **generate_kwargs):
+    """Generate for N audio variants of one clip, running the video frontend only once.
+
+    video_source: [1, C, T, H, W], audio_source: [N, F, T], padding_mask: [N, T].
+    The ResNet video features are computed once and shared (`video_features`)
+    by every `batch_size` batch of audio conditions going through the audio
+    frontend, fusion, encoder and decoder. Returns one token sequence per condition.
+    """
+    encoder = model.get_encoder()
+    with stage("video_frontend"):
+        video_features = encoder.forward_features(video_source, modality="video")
+    sequences = []
+    for start in range(0, len(audio_source), batch_size):
+        audio = audio_source[start:start + batch_size]
+        attention_mask = ~padding_mask[start:start + batch_size]
+        with stage("generate", conditions=len(audio)):
+            output = model.generate(
+                audio, attention_mask=attention_mask, video_features=video_features, **generate_kwargs
+            )
+        sequences.extend(output)
+    return sequences
+
+
+def run_noise_sweep(model, tokenizer, video_path, audio_path, grid, rng=None, batch_size=8, device=None):
+    """Transcribe one clip under every condition of a `NoiseGrid`.
+    Mixing happens in memory (`load_noisy_features`); returns one row per condition.
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    snrs, indices = grid.draw(rng)
+    with stage("feature_load", conditions=len(grid)):
+        sample = load_noisy_features(video_path, audio_path, grid.bank, snrs, rng=rng, indices=indices)
+    video_source, audio_source, padding_mask = sample["video_source"], sample["audio_source"], sample["padding_mask"]
+    if device is not None:
+        video_source, audio_source, padding_mask = video_source.to(device), audio_source.to(device), padding_mask.to(device)
+
+    sequences = generate_sweep(model, video_source, audio_source, padding_mask, batch_size=batch_size)
+    texts = tokenizer.batch_decode(sequences, skip_special_tokens=True)
+    return [
+        {"noise_type": noise_type, "snr": snr, "noise_file": grid.bank.files[index], "text": text}
+        for (noise_type, snr), index, text in zip(grid.conditions, indices, texts)
+    ]
@@ -0,0 +1,194 @@
+import os
+import json
+import time
+import threading
+import numpy as np
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+
+PROFILE_ENV = "AVSR_PROFILE"  # set to a directory to profile without touching code
+PERCENTILES = (50, 95, 99)
+
+_ACTIVE = None
+_LOCAL = threading.local()
+
+
+class Profiler(object):
+    """Collects per-stage timings of the preprocessing / inference pipeline.
+
+    Every `stage` becomes a Chrome trace event (open the exported file in
+    chrome://tracing or Perfetto) and is added to the record of the clip it ran
+    for, which gives one JSON record per clip. `summary` aggregates every stage
+    over all clips into p50/p95/p99; stages timed outside any clip (e.g. the
+    prefetcher's) count once per call. Stages may be timed from several
+    threads, but not from worker processes: those go to the process's own copy
+    of the profiler and are lost, so pool work is timed here around its results
+    (`landmark_detect`, `prefetch_load`).
+    """
+
+    def __init__(self, cuda_sync=False):
+        self.cuda_sync = cuda_sync
+        self.events = []
+        self.records = []
+        self.unattributed = defaultdict(list)  # {stage: durations} of stages run outside any clip
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def _sync(self):
+        if self.cuda_sync:
+            import torch
+            if torch.cuda.is_available():
+                torch.cuda.synchronize()
+
+    @contextmanager
+    def stage(self, name, **args):
+        self._sync()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._sync()
+            self.add(name, start, time.perf_counter() - start, **args)
+
+    def add(self, name, start, duration, **args):
+        clip = getattr(_LOCAL, "clip", None)
+        event = {
+            "name": name, "ph": "X", "pid": os.getpid(), "tid": threading.get_ident(),
+            "ts": (start - self._origin) * 1e6, "dur": duration * 1e6,
+            "args": dict(args, clip=clip["clip"]) if clip else args,
+        }
+        with self._lock:
+            self.events.append(event)
+            if clip is None:
+                self.unattributed[name].append(duration)
+        if clip is not None:
+            clip["stages"][name] = clip["stages"].get(name, 0.0) + duration
+
+    @contextmanager
+    def clip(self, clip_id):
+        """Attribute every stage run by this thread inside the block to `clip_id`."""
+        previous = getattr(_LOCAL, "clip", None)
+        record = {"clip": str(clip_id), "stages": {}}
+        _LOCAL.clip = record
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["total"] = time.perf_counter() - start
+            _LOCAL.clip = previous
+            with self._lock:
+                self.records.append(record)
+
+    def summary(self):
+        """{stage: {count, total, mean, p50, p95, p99}} in seconds, over all clips."""
+        durations = defaultdict(list)
+        with self._lock:
+            for record in self.records:
+                for name, duration in record["stages"].items():
+                    durations[name].append(duration)
+                durations["total"].append(record["total"])
+            for name, values in self.unattributed.items():
+                durations[name].extend(values)
+        summary = {}
+        for name, values in durations.items():
+            values = np.asarray(values)
+            summary[name] = {"count": len(values), "total": float(values.sum()), "mean": float(values.mean())}
+            for q, value in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+                summary[name][f"p{q}"] = float(value)
+        return summary
+
+    def print_summary(self):
+        summary = self.summary()
+        print(f"⏱️ Stage timings over {len(self.records)} clips (seconds)")
+        print(f"{'stage':<20}{'count':>8}{'p50':>10}{'p95':>10}{'p99':>10}{'total':>12}")
+        for name, row in sorted(summary.items(), key=lambda item: -item[1]["total"]):
+            print(f"{name:<20}{row['count']:>8}{row['p50']:>10.3f}{row['p95']:>10.3f}{row['p99']:>10.3f}{row['total']:>12.1f}")
+        print("(stages inside worker processes aren't timed one by one; "
+              "`landmark_detect` and `prefetch_load` are their wall time seen from this process)")
+
+    def save(self, out_dir):
+        """Write clips.jsonl (one record per clip), trace.json (Chrome trace) and summary.json."""
+        os.makedirs(out_dir, exist_ok=True)
+        with self._lock:
+            records, events = list(self.records), list(self.events)
+        with open(os.path.join(out_dir, "clips.jsonl"), "w") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+        with open(os.path.join(out_dir, "trace.json"), "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        with open(os.path.join(out_dir, "summary.json"), "w") as f:
+            json.dump(self.summary(), f, indent=2)
+        print(f"📊 Profile saved to {out_dir}")
+
+
+def get_profiler():
+    """The active profiler, or None when profiling is off."""
+    return _ACTIVE
+
+
+def enable(cuda_sync=False):
+    global _ACTIVE
+    _ACTIVE = Profiler(cuda_sync=cuda_sync)
+    return _ACTIVE
+
+
+def disable():
+    global _ACTIVE
+    profiler, _ACTIVE = _ACTIVE, None
+    return profiler
+
+
+@contextmanager
+def profiling(out_dir=None, cuda_sync=False, print_summary=True):
+    """Profile everything run inside the block; saved to `out_dir` (if given) on exit."""
+    profiler = enable(cuda_sync=cuda_sync)
+    try:
+        yield profiler
+    finally:
+        disable()
+        if print_summary:
+            profiler.print_summary()
+        if out_dir is not None:
+            profiler.save(out_dir)
+
+
+def profiling_from_env(cuda_sync=False):
+    """`profiling` into $AVSR_PROFILE when it's set, a no-op otherwise."""
+    out_dir = os.environ.get(PROFILE_ENV)
+    if not out_dir:
+        return nullcontext()
+    return profiling(out_dir, cuda_sync=cuda_sync)
+
+
+def stage(name, **args):
+    """Time a pipeline stage; free when profiling is off."""
+    if _ACTIVE is None:
+        return nullcontext()
+    return _ACTIVE.stage(name, **args)
+
+
+def clip(clip_id):
+    if _ACTIVE is None:
+        return nullcontext()
+    return _ACTIVE.clip(clip_id)
+
+
+def profile_module(module, name):
+    """Time every forward call of a torch module (e.g. the encoder) as stage `name`.
+    Returns the hook handles; calls made while profiling is off are not recorded.
+    """
+    def pre_hook(module, inputs):
+        profiler = _ACTIVE
+        if profiler is not None:
+            profiler._sync()
+        _LOCAL.__dict__.setdefault("module_starts", {})[id(module)] = time.perf_counter()
+
+    def post_hook(module, inputs, outputs):
+        start = _LOCAL.__dict__.get("module_starts", {}).pop(id(module), None)
+        profiler = _ACTIVE
+        if profiler is None or start is None:
+            return
+        profiler._sync()
+        profiler.add(name, start, time.perf_counter() - start)
+
+    return module.register_forward_pre_hook(pre_hook), module.register_forward_hook(post_hook)
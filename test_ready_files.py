@@ -1,6 +1,7 @@
 import os
 import shutil
 from pathlib import Path
+from src.dataset.lip_roi import find_lip_movement_files
 
 # Paths
 PROCESSED_DIR = Path("C:/github/rw/AV-HuBERT-S2S/video_processed")
@@ -8,15 +9,15 @@ GLIPS_ROOT = Path("C:/github/rw/AV-HuBERT-S2S/GLips/lipread_files")
 DEST_DIR = Path("C:/github/rw/AV-HuBERT-S2S/test_ready")
 DEST_DIR.mkdir(exist_ok=True)
 
-# Step 1: Collect all *_lip_movement.mp4 files
-lip_files = list(PROCESSED_DIR.glob("*_lip_movement.mp4"))
-print(f"📹 Found {len(lip_files)} lip movement videos.")
+# Step 1: Collect one lip movement file per clip (the lossless .npy ROI over an .mp4 preview)
+lip_files = find_lip_movement_files(PROCESSED_DIR)
+print(f"📹 Found {len(lip_files)} lip movement files.")
 
 copied = 0
 missing_audio = 0
 
-for lip_path in lip_files:
-    stem = lip_path.stem.replace("_lip_movement", "")  # e.g. "aber_0140-0056"
+for stem, lip_path in lip_files.items():  # e.g. "aber_0140-0056"
+    lip_path = Path(lip_path)
     label = stem.split("_")[0]  # e.g. "aber"
     wav_path = GLIPS_ROOT / label / "test" / f"{stem}.wav"
 
@@ -0,0 +1,66 @@
+import pytest
+import torch
+
+from src.dataset.load_data import collate_features, no_padding
+from src.model.av2text_config import AV2TextConfig
+from src.model.avhubert2text import AV2TextForConditionalGeneration
+
+CLIP_LENGTHS = (12, 20, 16)
+
+
+@pytest.fixture(scope="module")
+def tiny_model():
+    """A small randomly initialised model, enough to compare batched and single-clip outputs."""
+    torch.manual_seed(0)
+    config = AV2TextConfig(
+        vocab_size=50, encoder_layers=2, decoder_layers=2, encoder_ffn_dim=64, decoder_ffn_dim=64,
+        d_model=32, encoder_hidden_size=32, decoder_hidden_size=32, encoder_attention_heads=4, decoder_attention_heads=4,
+        audio_dropout=0., audio_feat_dim=104, dropout_features=0., dropout_input=0., encoder_embed_dim=32, final_dim=0,
+        feature_grad_mult=1.0, label_rate=25, sample_rate=25, logit_temp=0.1, mask_channel_length=10, mask_channel_min_space=1,
+        mask_channel_other=0, mask_channel_prob=0, mask_channel_selection="static", mask_length_audio=10, mask_length_image=10,
+        mask_min_space=1, mask_other=0, mask_prob_audio=0, mask_prob_image=0, mask_selection="static", masking_type="input",
+        modality_dropout=0, modality_fuse="concat", no_mask_channel_overlap=False, no_mask_overlap=False, num_classes=10,
+        num_dictionaries=1, resnet_relu_type="prelu", resnet_weights=None, selection_type="same_other_seq", sim_type="cosine",
+        skip_masked=False, skip_nomask=False, sub_encoder_layers=0, target_glu=False, untie_final_proj=False,
+        hidden_act="gelu", hidden_dropout=0., intermediate_size=64, layer_norm_eps=1e-5, layerdrop=0.,
+        num_conv_pos_embedding_groups=4, num_conv_pos_embeddings=16, num_attention_heads=4, dropout=0.,
+        feat_extract_activation="gelu",
+    )
+    return AV2TextForConditionalGeneration(config).eval()
+
+
+def encode_and_decode(model, batch, decoder_input_ids, masked=True):
+    attention_mask = ~batch["padding_mask"] if masked else None
+    encoder_outputs = model.model.encoder(
+        batch["audio_source"], attention_mask=attention_mask, video=batch["video_source"]
+    )
+    # the decoder's cross-attention mask comes from `_get_feature_vector_attention_mask`
+    logits = model(
+        encoder_outputs=encoder_outputs, attention_mask=attention_mask, decoder_input_ids=decoder_input_ids
+    ).logits
+    return encoder_outputs.last_hidden_state, logits
+
+
+def test_padded_batch_matches_single_clips(tiny_model):
+    torch.manual_seed(1)
+    samples = [
+        {
+            "video_source": torch.randn(1, 1, length, 88, 88),
+            "audio_source": torch.randn(1, 104, length),
+            "padding_mask": no_padding(1, length),
+        }
+        for length in CLIP_LENGTHS
+    ]
+    decoder_input_ids = torch.randint(3, 50, (len(samples), 5))
+    with torch.no_grad():
+        batch_hidden, batch_logits = encode_and_decode(tiny_model, collate_features(samples), decoder_input_ids)
+        for idx, (sample, length) in enumerate(zip(samples, CLIP_LENGTHS)):
+            hidden, logits = encode_and_decode(tiny_model, collate_features([sample]), decoder_input_ids[idx:idx + 1])
+            torch.testing.assert_close(batch_hidden[idx, :length], hidden[0], rtol=1e-5, atol=1e-5)
+            torch.testing.assert_close(batch_logits[idx], logits[0], rtol=1e-5, atol=1e-5)
+            # a clip alone has no padding, so its mask must not hide any encoder frame from
+            # the decoder (Speech2Text's own mask would keep only a conv-subsampled prefix)
+            _, unmasked_logits = encode_and_decode(
+                tiny_model, collate_features([sample]), decoder_input_ids[idx:idx + 1], masked=False
+            )
+            torch.testing.assert_close(logits, unmasked_logits, rtol=1e-5, atol=1e-5)
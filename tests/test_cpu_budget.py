@@ -0,0 +1,9 @@
+import numpy as np  # noqa: F401, BLAS is loaded before the limit, as in the pipeline
+from threadpoolctl import threadpool_info
+
+from src.dataset.cpu_budget import limit_threads
+
+
+def test_limit_threads_caps_loaded_blas():
+    limit_threads(1)
+    assert all(pool["num_threads"] == 1 for pool in threadpool_info() if pool["user_api"] == "blas")
@@ -0,0 +1,42 @@
+import random
+
+import numpy as np
+import pytest
+
+from src.dataset.load_data import IMAGE_MEAN, IMAGE_STD
+from src.dataset.utils import CenterCrop, Compose, HorizontalFlip, Normalize, RandomCrop
+
+
+def unfused(compose, frames, seed):
+    random.seed(seed)
+    for t in compose.preprocess:
+        frames = t(frames)
+    return frames
+
+
+@pytest.mark.parametrize("preprocess", [
+    [CenterCrop((88, 88)), Normalize(0.0, 255.0), Normalize(IMAGE_MEAN, IMAGE_STD)],
+    [RandomCrop((80, 72)), HorizontalFlip(0.5), Normalize(0.0, 255.0), Normalize(IMAGE_MEAN, IMAGE_STD)],
+    [Normalize(0.5, 2.0), HorizontalFlip(1.0), Normalize(-3.0, 0.25)],
+])
+def test_fused_compose_matches_step_by_step(preprocess):
+    compose = Compose(preprocess)
+    assert compose.fusable
+    rng = np.random.default_rng(0)
+    for seed in range(4):
+        frames = rng.integers(0, 256, (7, 96, 96), dtype=np.uint8)
+        random.seed(seed)
+        fused = compose(frames)
+        assert fused.dtype == np.float32 and fused.flags.c_contiguous
+        # exactly the steps run in float32, and the float64 numpy chain up to float32 rounding
+        np.testing.assert_array_equal(fused, unfused(compose, frames.astype(np.float32), seed))
+        np.testing.assert_allclose(fused, unfused(compose, frames, seed), rtol=1e-6, atol=1e-6)
+        random.seed(seed)
+        np.testing.assert_allclose(compose(frames.astype(np.float32)), fused, rtol=1e-6, atol=1e-6)
+
+
+def test_compose_with_other_steps_is_not_fused():
+    compose = Compose([CenterCrop((88, 88)), lambda frames: frames * 2, Normalize(0.0, 255.0)])
+    assert not compose.fusable
+    frames = np.random.default_rng(1).integers(0, 256, (3, 96, 96), dtype=np.uint8)
+    np.testing.assert_array_equal(compose(frames), unfused(compose, frames, 0))
@@ -0,0 +1,40 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from src.dataset import face_detectors
+from src.dataset.face_detectors import FaceDetector, get_face_detector
+
+
+class SlowDetector(FaceDetector):
+    name = "slow"
+    created = 0
+
+    def __init__(self):
+        super().__init__()
+        SlowDetector.created += 1
+        time.sleep(0.05)  # like loading a model, wide enough for the threads to race
+
+    def _detect_batch(self, gray_frames, upsample):
+        return [(1, 2, 11, 12) for _ in gray_frames]
+
+
+def test_backends_must_implement_detect_batch():
+    class Incomplete(FaceDetector):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_detector_is_created_once_across_threads(monkeypatch):
+    monkeypatch.setattr(face_detectors, "FACE_DETECTORS", {"slow": SlowDetector})
+    monkeypatch.setattr(face_detectors, "_DETECTORS", {})
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        detectors = list(executor.map(lambda _: get_face_detector("slow"), range(8)))
+    assert SlowDetector.created == 1
+    assert all(detector is detectors[0] for detector in detectors)
+    rect = detectors[0].detect_batch([np.zeros((20, 20), dtype=np.uint8)], scale=0.5)[0]
+    assert (rect.left(), rect.top(), rect.right(), rect.bottom()) == (2, 4, 22, 24)
@@ -0,0 +1,179 @@
+import inspect
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytest
+
+from src.dataset import landmark_pool
+from src.dataset.landmark_pool import LandmarkPool
+from src.dataset.landmark_cache import LandmarkCache
+from src.dataset.video_to_audio_lips import (
+    ADAPTIVE_SKIP_INTERVAL, ADAPTIVE_TASK_SKIPS, TRACK_REDETECT_INTERVAL, adaptive_landmarks,
+    detect_landmarks_chunked, landmark_cache_key, landmark_chunk_size, track_landmarks,
+)
+
+FRAME_SHAPE = (4, 8)
+
+pytestmark = pytest.mark.skipif(
+    multiprocessing.get_start_method() != "fork", reason="the fake worker is installed by monkeypatching before fork"
+)
+
+
+def fake_track(gray_frames, mode, seed_rect=None, **options):
+    """Stand-in for `detect_landmarks` in track mode: the face x is the frame's gray level.
+    A task starts from `seed_rect` when given, otherwise from a keyframe detection,
+    and (like tracking a still face) keeps that box for the rest of the task. The
+    y of every point is the index of the task's keyframe (see `indexed_frames`).
+    """
+    x = seed_rect[0] if seed_rect is not None else None
+    landmarks = np.zeros((len(gray_frames), 68, 2), dtype=np.float32)
+    landmarks[:, :, 1] = frame_index(gray_frames[0])
+    for idx, gray in enumerate(gray_frames):
+        x = int(gray[0, 0]) if x is None else x
+        landmarks[idx, :, 0] = x
+    valid = np.ones(len(gray_frames), dtype=bool)
+    stats = {"frames": len(gray_frames), "detector_calls": int(seed_rect is None), "skipped": 0, "detector_seconds": 0.0}
+    return landmarks, valid, np.zeros(len(gray_frames), dtype=bool), stats
+
+
+def frame_index(gray):
+    return int(gray[0, 0]) + 256 * int(gray[0, 1])
+
+
+def fake_tasks(gray_frames, mode, **options):
+    """Stand-in for `detect_landmarks` recording task boundaries: every frame gets the index
+    of its task's first frame (frames carry their index, see `indexed_frames`) and the task length.
+    """
+    first = frame_index(gray_frames[0])
+    landmarks = np.zeros((len(gray_frames), 68, 2), dtype=np.float32)
+    landmarks[:, :, 0], landmarks[:, :, 1] = first, len(gray_frames)
+    valid = np.ones(len(gray_frames), dtype=bool)
+    stats = {"frames": len(gray_frames), "detector_calls": 1, "skipped": 0, "detector_seconds": 0.0}
+    return landmarks, valid, np.zeros(len(gray_frames), dtype=bool), stats
+
+
+def fake_detect(gray_frames, mode, **options):
+    return (fake_tasks if mode == "tasks" else fake_track)(gray_frames, mode, **options)
+
+
+def fake_init_worker(shm_name, num_slots, frame_shape, *args):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    landmark_pool._WORKER_STATE["shm"] = shm
+    landmark_pool._WORKER_STATE["frames"] = np.ndarray((num_slots, *frame_shape), dtype=np.uint8, buffer=shm.buf)
+    landmark_pool._WORKER_STATE["detect"] = fake_detect
+
+
+def face_frames(x, num_frames):
+    return [np.full((*FRAME_SHAPE, 3), x, dtype=np.uint8) for _ in range(num_frames)]
+
+
+def indexed_frames(start, stop):
+    frames = []
+    for idx in range(start, stop):
+        frame = np.zeros((*FRAME_SHAPE, 3), dtype=np.uint8)
+        frame[0, 0], frame[0, 1] = idx % 256, idx // 256
+        frames.append(frame)
+    return frames
+
+
+def task_starts_y(landmarks):
+    return sorted(set(landmarks[:, 0, 1].astype(int).tolist()))
+
+
+def task_starts(landmarks):
+    return sorted(set(landmarks[:, 0, 0].astype(int).tolist()))
+
+
+@pytest.mark.parametrize("num_workers,slots_per_worker", [(1, 13), (3, 5), (5, 32)])
+def test_tasks_are_never_split_by_slot_exhaustion(monkeypatch, num_workers, slots_per_worker):
+    monkeypatch.setattr(landmark_pool, "_init_worker", fake_init_worker)
+    with LandmarkPool(num_workers=num_workers, slots_per_worker=slots_per_worker, frame_shape=FRAME_SHAPE) as pool:
+        found, _, _, stats = pool.detect(indexed_frames(0, 95), mode="tasks", chunk_size=10)
+    assert task_starts(found) == list(range(0, 95, 10))
+    assert (found[:90, 0, 1] == 10).all() and (found[90:, 0, 1] == 5).all()
+    assert stats["frames"] == 95
+
+
+def test_concurrent_callers_keep_whole_tasks(monkeypatch):
+    monkeypatch.setattr(landmark_pool, "_init_worker", fake_init_worker)
+    with LandmarkPool(num_workers=2, slots_per_worker=12, frame_shape=FRAME_SHAPE) as pool, \
+            ThreadPoolExecutor(max_workers=3) as executor:
+        results = list(executor.map(
+            lambda _: pool.detect(indexed_frames(0, 200), mode="tasks", chunk_size=10)[0], range(3)
+        ))
+    for found in results:
+        assert task_starts(found) == list(range(0, 200, 10))
+
+
+def test_task_larger_than_the_pool_is_rejected(monkeypatch):
+    monkeypatch.setattr(landmark_pool, "_init_worker", fake_init_worker)
+    with LandmarkPool(num_workers=1, slots_per_worker=4, frame_shape=FRAME_SHAPE) as pool:
+        with pytest.raises(ValueError):
+            pool.detect(indexed_frames(0, 10), mode="tasks", chunk_size=5)
+
+
+def test_seed_only_reaches_the_first_task_when_the_face_moves(monkeypatch):
+    monkeypatch.setattr(landmark_pool, "_init_worker", fake_init_worker)
+    with LandmarkPool(num_workers=2, frame_shape=FRAME_SHAPE) as pool:
+        first, _, _, _ = pool.detect(face_frames(50, 40), mode="track", chunk_size=10)
+        seed_rect = (int(first[-1, 0, 0]), 0, 60, 10)
+        # the face moved between clips of the session, so the seed box is stale
+        second, valid, _, stats = pool.detect(
+            face_frames(200, 40), mode="track", chunk_size=10, seed_rect=seed_rect
+        )
+
+    assert (first[:, :, 0] == 50).all()
+    assert valid.all()
+    assert (second[:10, :, 0] == 50).all()  # the seeded task (a real tracker re-detects on drift)
+    assert (second[10:, :, 0] == 200).all()  # every later task starts from a keyframe detection
+    assert stats["detector_calls"] == 3
+
+
+@pytest.mark.parametrize("num_workers", [1, 3])
+def test_chunked_track_landmarks_match_serial(monkeypatch, num_workers):
+    monkeypatch.setattr(landmark_pool, "_init_worker", fake_init_worker)
+    num_frames, chunk_frames = 1010, 150  # whole keyframe intervals (25 frames) per chunk
+    options = {"redetect_interval": 25, "seed_rect": (7, 0, 60, 10)}
+    bounds = list(range(0, num_frames, chunk_frames)) + [num_frames]
+    with LandmarkPool(num_workers=num_workers, slots_per_worker=30 // num_workers + 1, frame_shape=FRAME_SHAPE) as pool:
+        serial = pool.detect(indexed_frames(0, num_frames), mode="track", chunk_size=25, **options)
+        chunked = detect_landmarks_chunked(
+            pool, lambda idx: indexed_frames(bounds[idx], bounds[idx + 1]), len(bounds) - 1, "track", options, 4
+        )
+    for serial_part, chunked_part in zip(serial[:3], chunked[:3]):
+        np.testing.assert_array_equal(serial_part, chunked_part)
+    assert task_starts_y(serial[0]) == list(range(0, num_frames, 25))
+    assert chunked[3] == serial[3]
+
+
+def test_track_detector_calls_follow_the_keyframe_interval(monkeypatch):
+    monkeypatch.setattr(landmark_pool, "_init_worker", fake_init_worker)
+    for num_workers, slots_per_worker in [(1, 26), (3, 9), (5, 32)]:
+        with LandmarkPool(num_workers=num_workers, slots_per_worker=slots_per_worker, frame_shape=FRAME_SHAPE) as pool:
+            _, _, _, stats = pool.detect(indexed_frames(0, 3000), mode="track", chunk_size=25)
+        assert stats["detector_calls"] == 3000 // 25
+
+
+def test_track_cache_key_includes_the_task_length(tmp_path):
+    video = tmp_path / "clip.mp4"
+    video.write_bytes(b"not really a video")
+    cache = LandmarkCache(tmp_path / "cache")
+    keys = [
+        landmark_cache_key(cache, video, "track", options)
+        for options in ({}, {"redetect_interval": 25}, {"redetect_interval": 10})
+    ]
+    assert keys[2] not in keys[:2]
+    assert landmark_cache_key(cache, video, "detect", {}) != keys[0]
+
+
+@pytest.mark.parametrize("mode, function, options, task_frames, default_task_frames", [
+    ("track", track_landmarks, {"redetect_interval": 10}, 10, TRACK_REDETECT_INTERVAL),
+    ("adaptive", adaptive_landmarks, {"skip_interval": 4, "motion_threshold": 3.0},
+     4 * ADAPTIVE_TASK_SKIPS, ADAPTIVE_SKIP_INTERVAL * ADAPTIVE_TASK_SKIPS),
+])
+def test_task_length_comes_from_options_the_mode_accepts(mode, function, options, task_frames, default_task_frames):
+    inspect.signature(function).bind([], **options)  # the pool forwards every option to each task
+    assert landmark_chunk_size(mode, options) == task_frames
+    assert landmark_chunk_size(mode, {}) == default_task_frames
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from src.dataset.lip_roi import LipRoiWriter, find_lip_movement_files, lip_movement_key, load_lip_roi, save_lip_roi
+from src.dataset.video_to_audio_lips import save_lip_movement
+
+
+def test_find_lip_movement_files_prefers_npy(tmp_path):
+    for name in ["a_lip_movement.mp4", "a_lip_movement.npy", "b_lip_movement.mp4", "c_lip_movement.npy", "c.mp4", "d.wav"]:
+        (tmp_path / name).touch()
+    found = find_lip_movement_files(tmp_path)
+    assert sorted(found) == ["a", "b", "c"]
+    assert found["a"].endswith("a_lip_movement.npy")
+    assert found["b"].endswith("b_lip_movement.mp4")
+
+
+def test_lip_movement_key():
+    assert lip_movement_key("dir/aber_0140-0056_lip_movement.npy") == "aber_0140-0056"
+    assert lip_movement_key("aber_0140-0056.mp4") is None
+
+
+def failing_frames(count):
+    for _ in range(count):
+        yield np.zeros((96, 96), dtype=np.uint8)
+    raise IOError("decode failed")
+
+
+def test_writer_refuses_truncated_passthrough(tmp_path):
+    path = tmp_path / "clip_lip_movement.npy"
+    with pytest.raises(RuntimeError):
+        with LipRoiWriter(path) as writer:
+            frames = writer.passthrough(failing_frames(3))
+            try:  # a consumer like save_video that only prints errors
+                for _ in frames:
+                    pass
+            except IOError:
+                pass
+            for _ in frames:
+                pass
+    assert not path.exists()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_save_lip_roi_round_trip(tmp_path):
+    frames = np.random.default_rng(0).integers(0, 256, (5, 96, 96), dtype=np.uint8)
+    assert save_lip_roi(frames, tmp_path / "clip.npy") == 5
+    assert np.array_equal(load_lip_roi(tmp_path / "clip.npy"), frames)
+
+
+def test_writer_skips_empty_clips(tmp_path):
+    path = tmp_path / "clip_lip_movement.npy"
+    with pytest.warns(UserWarning, match="no frames"):
+        assert save_lip_roi(iter([]), path) == 0
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_save_lip_movement_skips_empty_clips(tmp_path, capsys):
+    with pytest.warns(UserWarning):
+        save_lip_movement(iter([]), tmp_path / "clip_lip_movement.npy")
+    assert list(tmp_path.iterdir()) == []
+    assert "✅" not in capsys.readouterr().out
@@ -0,0 +1,33 @@
+import numpy as np
+import torch
+
+from src.dataset.load_data import collate_features, no_padding, to_uint8_video_source, video_features_from_frames
+
+
+def uint8_sample(frames):
+    return {
+        "video_source": to_uint8_video_source(frames),
+        "audio_source": torch.randn(1, 104, len(frames)),
+        "padding_mask": no_padding(1, len(frames)),
+    }
+
+
+def test_collate_uint8_mixed_frame_sizes():
+    rng = np.random.default_rng(0)
+    roi = rng.integers(0, 256, (12, 96, 96), dtype=np.uint8)
+    resized = rng.integers(0, 256, (7, 480, 640), dtype=np.uint8)  # resize fallback of a clip without a face
+    batch = collate_features([uint8_sample(roi), uint8_sample(resized)])
+
+    assert batch["video_source"].dtype == torch.uint8
+    assert batch["video_source"].shape == (2, 1, 12, 88, 88)
+    assert batch["lengths"].tolist() == [12, 7]
+    assert batch["padding_mask"][1, 7:].all() and not batch["padding_mask"][1, :7].any()
+    assert torch.equal(batch["video_source"][0, 0], torch.from_numpy(roi[:, 4:92, 4:92]))
+    assert torch.equal(batch["video_source"][1, 0, :7], torch.from_numpy(resized[:, 196:284, 276:364]))
+
+
+def test_uint8_crop_matches_float_features():
+    frames = np.random.default_rng(1).integers(0, 256, (5, 480, 640), dtype=np.uint8)
+    video = to_uint8_video_source(frames)[0, 0].numpy()
+    features = video_features_from_frames(frames)[..., 0]
+    assert np.allclose((video / 255.0 - 0.421) / 0.165, features, atol=1e-5)
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from src.dataset.noise_mixing import mix_noise_batch
+from src.dataset.video_to_audio_lips import add_noise
+
+
+def reference_add_noise(signal, noise, snr):
+    """The former one-mixture-at-a-time `add_noise` (signal and noise already the same length)."""
+    signal = signal.astype(np.float32)
+    noise = noise.astype(np.float32)
+    amp_s = np.sqrt(np.mean(np.square(signal), axis=-1))
+    amp_n = np.sqrt(np.mean(np.square(noise), axis=-1))
+    mixed = signal + noise * (amp_s / amp_n) / (10 ** (snr / 20))
+    max_int16, min_int16 = np.iinfo(np.int16).max, np.iinfo(np.int16).min
+    if mixed.max(axis=0) > max_int16 or mixed.min(axis=0) < min_int16:
+        if mixed.max(axis=0) >= abs(mixed.min(axis=0)):
+            mixed = mixed * (max_int16 / mixed.max(axis=0))
+        else:
+            mixed = mixed * (min_int16 / mixed.min(axis=0))
+    return mixed.astype(np.int16)
+
+
+@pytest.mark.parametrize("signal_scale", [3000, 30000])  # the loud signal clips at low SNRs
+def test_mix_noise_batch_matches_add_noise(signal_scale):
+    rng = np.random.default_rng(0)
+    signal = (np.sin(np.linspace(0, 200, 8000)) * signal_scale).astype(np.int16)
+    noises = rng.integers(-20000, 20000, (6, 8000)).astype(np.int16)
+    snrs = np.array([-10, -5, 0, 5, 10, 20], dtype=np.float32)
+    mixed = mix_noise_batch(signal, noises, snrs)
+    expected = np.stack([reference_add_noise(signal, noise, snr) for noise, snr in zip(noises, snrs)])
+    assert mixed.dtype == np.int16
+    # float32 rounding may move a sample across an integer boundary
+    np.testing.assert_allclose(mixed.astype(np.int32), expected.astype(np.int32), atol=1)
+    # the loud case really exercises the scale-down: some mixtures are scaled to the int16 limit
+    at_limit = (mixed.max(axis=-1) >= 32766) | (mixed.min(axis=-1) <= -32767)
+    assert at_limit.any() == (signal_scale == 30000)
+
+def test_add_noise_repeats_short_noise():
+    rng = np.random.default_rng(1)
+    signal = rng.integers(-3000, 3000, 5000).astype(np.int16)
+    noise = rng.integers(-3000, 3000, 1200).astype(np.int16)
+    expected = reference_add_noise(signal, np.concatenate([noise] * 5)[:5000], 5.0)
+    np.testing.assert_allclose(add_noise(signal, noise, 5.0).astype(np.int32), expected.astype(np.int32), atol=1)
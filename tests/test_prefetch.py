@@ -0,0 +1,57 @@
+import threading
+import time
+
+import torch
+
+from src import profiling
+from src.dataset import prefetch
+from src.dataset.prefetch import Prefetcher
+from src.profiling import stage
+
+
+def load(idx, delay=0.0):
+    time.sleep(delay)
+    if idx == 3:
+        raise ValueError("broken clip")
+    return {"idx": idx, "video": torch.full((2, 2), idx)}
+
+
+def test_prefetcher_keeps_order_and_reports_errors():
+    items = [(idx, 0.05 * (idx % 3 == 0)) for idx in range(8)]
+    with Prefetcher(load, items, num_workers=3, depth=4, pin_memory=False) as prefetcher:
+        results = list(prefetcher)
+    assert [item for item, _, _ in results] == items
+    assert [result["idx"] for _, result, error in results if error is None] == [0, 1, 2, 4, 5, 6, 7]
+    assert isinstance(results[3][2], ValueError) and results[3][1] is None
+
+
+def test_prefetcher_pins_in_the_background(monkeypatch):
+    pinned_by = []
+
+    def record_pin(sample):
+        pinned_by.append(threading.current_thread())
+        return dict(sample, pinned=True)
+
+    monkeypatch.setattr(prefetch, "pin_sample", record_pin)
+    with Prefetcher(load, [(idx,) for idx in range(3)], num_workers=2, depth=2) as prefetcher:
+        results = list(prefetcher)
+    assert all(result["pinned"] for _, result, _ in results)
+    assert len(pinned_by) == 3 and threading.main_thread() not in pinned_by
+
+
+def timed_load(idx):
+    with stage("video_features"):  # runs in a worker, so the parent never sees it
+        time.sleep(0.02)
+    return idx
+
+
+def test_prefetcher_times_loads_in_this_process():
+    profiler = profiling.enable()
+    try:
+        with Prefetcher(timed_load, [(idx,) for idx in range(4)], num_workers=2, depth=2, pin_memory=False) as prefetcher:
+            assert [result for _, result, _ in prefetcher] == [0, 1, 2, 3]
+    finally:
+        profiling.disable()
+    summary = profiler.summary()
+    assert summary["prefetch_load"]["count"] == 4 and summary["prefetch_load"]["p50"] >= 0.02
+    assert "video_features" not in summary
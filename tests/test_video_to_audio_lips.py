@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+from skimage import transform as tf
+
+from src.dataset.video_to_audio_lips import compute_roi_transforms, estimate_similarity_transforms, landmarks_interpolate
+
+
+def test_similarity_transforms_match_skimage():
+    rng = np.random.default_rng(0)
+    src = rng.uniform(0, 640, (20, 5, 2))
+    dst = rng.uniform(0, 256, (5, 2))
+    transforms = estimate_similarity_transforms(src, dst)
+    for points, transform in zip(src, transforms):
+        expected = tf.estimate_transform("similarity", points, dst).params
+        np.testing.assert_allclose(transform, expected[:2], atol=1e-8)
+
+
+@pytest.mark.parametrize("offset", [(0, 0), (-200, 0), (0, 200), (300, -300)])
+def test_roi_stays_inside_the_aligned_face(offset):
+    # the mean face doubles as the landmarks, moved so the mouth lands anywhere in the 256x256 face
+    rng = np.random.default_rng(1)
+    mean_face = rng.uniform(60, 200, (68, 2))
+    landmarks = np.repeat(mean_face[None], 3, axis=0)
+    landmarks[:, 48:68] += offset
+    transforms = compute_roi_transforms(landmarks, mean_face, window_margin=3)
+    # the stable points sit on the mean face, so the alignment is the identity (up to the
+    # 1/1024 px smoothing) and the translation is minus the patch's top-left corner
+    np.testing.assert_allclose(transforms[:, :, :2], np.repeat(np.eye(2)[None], 3, axis=0), atol=1e-3)
+    corners = -transforms[:, :, 2]
+    assert ((corners > -0.5) & (corners + 96 < 256.5)).all()
+
+
+def reference_interpolate(landmarks):
+    """The former per-gap loop over a list of (68, 2) arrays / None."""
+    valid_frames_idx = [idx for idx, points in enumerate(landmarks) if points is not None]
+    for prev_idx, next_idx in zip(valid_frames_idx, valid_frames_idx[1:]):
+        delta = landmarks[next_idx] - landmarks[prev_idx]
+        for step in range(1, next_idx - prev_idx):
+            landmarks[prev_idx + step] = landmarks[prev_idx] + step / float(next_idx - prev_idx) * delta
+    first, last = valid_frames_idx[0], valid_frames_idx[-1]
+    landmarks[:first] = [landmarks[first]] * first
+    landmarks[last:] = [landmarks[last]] * (len(landmarks) - last)
+    return np.stack(landmarks)
+
+
+@pytest.mark.parametrize("valid_idx", [
+    [3, 4, 9, 10, 11, 17, 30],  # leading, interior and trailing gaps
+    [0, 5, 39],  # no edge gaps
+    [12],  # a single valid frame
+])
+def test_landmarks_interpolate_matches_per_gap_fill(valid_idx):
+    rng = np.random.default_rng(2)
+    landmarks = rng.uniform(0, 640, (40, 68, 2)).astype(np.float32)
+    valid = np.zeros(40, dtype=bool)
+    valid[valid_idx] = True
+    expected = reference_interpolate(
+        [points.astype(np.float64) if ok else None for points, ok in zip(landmarks, valid)]
+    )
+    filled = landmarks_interpolate(landmarks, valid)
+    assert filled.dtype == np.float32
+    np.testing.assert_allclose(filled, expected, rtol=1e-5, atol=1e-3)
+    np.testing.assert_array_equal(filled[valid], landmarks[valid])
+
+
+def test_landmarks_interpolate_without_valid_frames():
+    assert landmarks_interpolate(np.zeros((5, 68, 2), dtype=np.float32), np.zeros(5, dtype=bool)) is None